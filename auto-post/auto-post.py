@@ -4,7 +4,8 @@ import os
 import sys
 import json
 import argparse
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
@@ -12,13 +13,18 @@ from datetime import datetime
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger, load_config
+from utils import setup_logger, load_config, save_batch, stage_batch_file
 from reader import DocumentReader
 from optimizer import DocumentOptimizer
 from blog_enhancer import BlogEnhancer
 from reviewer import ContentReviewer
 from privacy_checker import PrivacyChecker
 from publisher import BlogPublisher
+from executor import ParallelExecutor, process_timed
+from scheduler import StreamingScheduler, snapshot_documents, MUTATING, READ_ONLY
+from state_store import StateStore
+from stage_cache import StageCache
+from format_linter import FormatLinter
 
 class AutoPostSystem:
     """自动发布系统主控制器"""
@@ -30,18 +36,34 @@ class AutoPostSystem:
         # 加载系统设置
         self.settings = load_config(self.config_dir / 'settings.json') or {}
 
+        # 流程状态库（文档清单、阶段状态、耗时和阶段输出）
+        self.store = StateStore(self.config_dir / 'state.db')
+
+        # 阶段输出缓存：输入文档和阶段配置都没变时直接使用上次的输出
+        cache_config = self.settings.get('system', {}).get('stage_cache', {})
+        self.stage_cache = None
+        if cache_config.get('enabled', False):
+            self.stage_cache = StageCache(
+                self.config_dir / cache_config.get('file', 'stage_cache.db'),
+                max_bytes=cache_config.get('max_megabytes', 256) * 1024 * 1024
+            )
+
         # 初始化各个模块
-        self.reader = DocumentReader(self.config_dir)
+        self.reader = DocumentReader(self.config_dir, store=self.store)
         self.optimizer = DocumentOptimizer(self.config_dir)
         self.enhancer = BlogEnhancer(self.config_dir)
         self.reviewer = ContentReviewer(self.config_dir)
         self.privacy_checker = PrivacyChecker(self.config_dir)
         self.publisher = BlogPublisher(self.config_dir)
+        self.format_linter = FormatLinter()
 
         self.logger.info("自动发布系统初始化完成")
 
-    def run_full_pipeline(self):
-        """运行完整的处理流程"""
+    def run_full_pipeline(self, resume=False):
+        """运行完整的处理流程
+
+        resume 为 True 时未完成的文档从最近一次成功的阶段继续，只执行剩余阶段。
+        """
         self.logger.info("=" * 50)
         self.logger.info("开始运行自动文章发布流程")
         self.logger.info("=" * 50)
@@ -55,118 +77,50 @@ class AutoPostSystem:
             'errors': []
         }
 
-        try:
-            # 步骤 1: 读取文档
-            self.logger.info("\n[步骤 1/7] 读取 unpost 目录中的文档...")
-            batches = self.reader.run()
-            if not batches:
-                self.logger.info("没有发现新文档，流程结束")
-                return self._generate_report(stats)
+        # CPU 密集的阶段按 max_parallel_batches 限制并行执行
+        self.executor = ParallelExecutor(self.settings.get('system', {}).get('max_parallel_batches', 1))
+        # 只读校验（严重问题统计、格式检查）在线程池中对文档快照执行
+        self.validators = ThreadPoolExecutor(
+            max_workers=self.settings.get('system', {}).get('validation_workers', 2),
+            thread_name_prefix='validate'
+        )
 
-            batch_files = [batch['batch_file'] for batch in batches]
-            stats['total_documents'] = sum(batch['count'] for batch in batches)
-            self.logger.info(f"发现 {stats['total_documents']} 个文档，创建了 {len(batches)} 个批次")
-
-            # 步骤 2: 优化标题和结构
-            if self.settings.get('processing', {}).get('enable_title_optimization', True):
-                self.logger.info("\n[步骤 2/7] 优化标题和文档结构...")
-                optimized_batches = self.optimizer.run(batch_files)
-                if not optimized_batches:
-                    raise RuntimeError("标题和结构优化失败")
-                batch_files = optimized_batches
-            else:
-                self.logger.info("\n[步骤 2/7] 跳过标题和结构优化")
-
-            # 步骤 3: 博客内容增强
-            if self.settings.get('processing', {}).get('enable_blog_enhancement', True):
-                self.logger.info("\n[步骤 3/7] 增强博客内容（摘要、分类、标签等）...")
-                enhanced_batches = self.enhancer.run(batch_files)
-                if not enhanced_batches:
-                    raise RuntimeError("博客内容增强失败")
-                batch_files = enhanced_batches
-            else:
-                self.logger.info("\n[步骤 3/7] 跳过博客内容增强")
-
-            # 步骤 4: 内容审查和修正
-            if self.settings.get('processing', {}).get('enable_content_review', True):
-                self.logger.info("\n[步骤 4/7] 审查和修正文档内容...")
-                reviewed_batches = self.reviewer.run(batch_files)
-                if not reviewed_batches:
-                    raise RuntimeError("内容审查失败")
-                batch_files = reviewed_batches
-            else:
-                self.logger.info("\n[步骤 4/7] 跳过内容审查")
-
-            # 步骤 5: 隐私内容检测
-            if self.settings.get('processing', {}).get('enable_privacy_check', True):
-                self.logger.info("\n[步骤 5/8] 检测和处理隐私内容...")
-                checked_batches = self.privacy_checker.run(batch_files)
-                if not checked_batches:
-                    raise RuntimeError("隐私内容检测失败")
-
-                # 检查是否有关键隐私问题
-                critical_issues = 0
-                for batch_file in checked_batches:
-                    with open(batch_file, 'r', encoding='utf-8') as f:
-                        documents = json.load(f)
-                        for doc in documents:
-                            if doc.get('has_critical_issues', False):
-                                critical_issues += 1
-
-                if critical_issues > 0:
-                    error_msg = f"发现 {critical_issues} 个文档包含严重隐私问题，已停止发布"
-                    self.logger.error(error_msg)
-                    stats['errors'].append(error_msg)
-                    return self._generate_report(stats)
-
-                batch_files = checked_batches
+        try:
+            if self.settings.get('system', {}).get('pipeline_mode', 'staged') == 'streaming':
+                batches = self._run_streaming_pipeline(stats, resume)
             else:
-                self.logger.info("\n[步骤 5/8] 跳过隐私内容检测")
-
-            # 步骤 6: 文档格式检查
-            self.logger.info("\n[步骤 6/8] 检查文档格式...")
+                batches = self._run_staged_pipeline(stats, resume)
 
-            # 只做格式检查，不修改文档
-            format_issues = 0
-            for batch_file in batch_files:
-                try:
-                    with open(batch_file, 'r', encoding='utf-8') as f:
-                        documents = json.load(f)
-
-                    for doc in documents:
-                        content = doc.get('optimized_content', '')
-                        if self._check_format_issues(content):
-                            format_issues += 1
-                            self.logger.warning(f"文档 {doc.get('filename', 'unknown')} 存在格式问题")
-                except:
-                    pass
-
-            if format_issues > 0:
-                self.logger.warning(f"发现 {format_issues} 个文档存在格式问题，建议手动检查")
-            else:
-                self.logger.info("所有文档格式检查通过")
+            # 没有新文档或发现严重隐私问题时提前结束
+            if batches is None:
+                return self._generate_report(stats)
 
-            # 步骤 7: 发布博客文章
-            self.logger.info("\n[步骤 7/8] 发布博客文章...")
-            published_batches = self.publisher.run(
-                batch_files,
+            published_count = sum(
+                1 for batch in batches for doc in batch['documents'] if doc.status == 'published'
+            )
+            site_ok = self.publisher.finish_publishing(
+                published_count,
                 test_local=self.settings.get('processing', {}).get('enable_local_test', True),
                 deploy=self.settings.get('processing', {}).get('enable_auto_deploy', False)
             )
-            if not published_batches:
-                raise RuntimeError("博客发布失败")
+            if not site_ok:
+                # 文章文件已生成，--resume 时只需重新生成和部署站点
+                for batch in batches:
+                    for doc in batch['documents']:
+                        if doc.status == 'published':
+                            doc.fail('deploy_failed', '站点生成或部署失败')
+
+            self._record_results(batches)
 
             # 统计发布结果
-            for batch_file in published_batches:
-                with open(batch_file, 'r', encoding='utf-8') as f:
-                    documents = json.load(f)
-                    for doc in documents:
-                        if doc.get('status') == 'published':
-                            stats['published_documents'] += 1
-                        elif doc.get('status') in ['read', 'optimized', 'enhanced', 'reviewed', 'privacy_checked']:
-                            stats['processed_documents'] += 1
-                        else:
-                            stats['errors'].append(f"{doc.get('filename', 'unknown')}: {doc.get('error', 'Unknown error')}")
+            for batch in batches:
+                for doc in batch['documents']:
+                    if doc.status == 'published':
+                        stats['published_documents'] += 1
+                    elif doc.status in ['read', 'optimized', 'enhanced', 'reviewed', 'privacy_checked']:
+                        stats['processed_documents'] += 1
+                    else:
+                        stats['errors'].append(f"{doc.filename or 'unknown'}: {doc.error or 'Unknown error'}")
 
             # 步骤 8: 清理临时文件
             self.logger.info("\n[步骤 8/8] 清理临时文件...")
@@ -185,6 +139,9 @@ class AutoPostSystem:
             self.logger.info(f"处理文档数: {stats['processed_documents']}")
             self.logger.info(f"发布文档数: {stats['published_documents']}")
             self.logger.info(f"耗时: {stats['duration_seconds']:.2f} 秒")
+            if self.stage_cache is not None:
+                cache_stats = self.stage_cache.stats
+                self.logger.info(f"阶段缓存: 命中 {cache_stats['hits']}, 未命中 {cache_stats['misses']}")
             if stats['errors']:
                 self.logger.warning(f"错误数: {len(stats['errors'])}")
                 for error in stats['errors']:
@@ -199,58 +156,299 @@ class AutoPostSystem:
             stats['success'] = False
             stats['end_time'] = datetime.now().isoformat()
             return self._generate_report(stats)
+        finally:
+            self.executor.shutdown()
+            self.validators.shutdown()
+
+    def _run_staged_pipeline(self, stats, resume=False):
+        """按阶段顺序处理：所有批次完成一个阶段后再进入下一个阶段
+
+        返回处理后的批次；没有新文档或发现严重隐私问题时返回 None。
+        """
+        # 步骤 1: 读取文档
+        self.logger.info("\n[步骤 1/7] 读取 unpost 目录中的文档...")
+        batches = self.reader.run(
+            batch_size=self.settings.get('system', {}).get('batch_size', 10),
+            save_batches=self._save_snapshots(),
+            resume=resume
+        )
+        if not batches:
+            self.logger.info("没有发现新文档，流程结束")
+            return None
+        self._record_read(batches)
+
+        stats['total_documents'] = sum(batch['count'] for batch in batches)
+        self.logger.info(f"发现 {stats['total_documents']} 个文档，创建了 {len(batches)} 个批次")
+
+        # 步骤 2: 优化标题和结构
+        if self.settings.get('processing', {}).get('enable_title_optimization', True):
+            self.logger.info("\n[步骤 2/7] 优化标题和文档结构...")
+            self._run_stage(self.optimizer, batches, 'optimized', parallel=True)
+        else:
+            self.logger.info("\n[步骤 2/7] 跳过标题和结构优化")
+
+        # 步骤 3: 博客内容增强
+        if self.settings.get('processing', {}).get('enable_blog_enhancement', True):
+            self.logger.info("\n[步骤 3/7] 增强博客内容（摘要、分类、标签等）...")
+            self._run_stage(self.enhancer, batches, 'enhanced', parallel=True)
+        else:
+            self.logger.info("\n[步骤 3/7] 跳过博客内容增强")
+
+        # 步骤 4: 内容审查和修正
+        if self.settings.get('processing', {}).get('enable_content_review', True):
+            self.logger.info("\n[步骤 4/7] 审查和修正文档内容...")
+            self._run_stage(self.reviewer, batches, 'reviewed', parallel=True)
+        else:
+            self.logger.info("\n[步骤 4/7] 跳过内容审查")
+
+        # 步骤 5: 隐私内容检测
+        privacy_enabled = self.settings.get('processing', {}).get('enable_privacy_check', True)
+        if privacy_enabled:
+            self.logger.info("\n[步骤 5/8] 检测和处理隐私内容...")
+            self._run_privacy_stage(batches)
+        else:
+            self.logger.info("\n[步骤 5/8] 跳过隐私内容检测")
+
+        # 步骤 6: 文档格式检查（只读校验，与严重问题统计和发布在线程池中同时进行）
+        snapshots = snapshot_documents(batches)
+        format_scan = self.validators.submit(self._scan_format, snapshots)
+
+        # 发布前必须确认没有严重隐私问题
+        if privacy_enabled:
+            critical_issues = self.validators.submit(self._count_critical_issues, snapshots).result()
+            if critical_issues > 0:
+                format_scan.cancel()
+                error_msg = f"发现 {critical_issues} 个文档包含严重隐私问题，已停止发布"
+                self.logger.error(error_msg)
+                stats['errors'].append(error_msg)
+                self._record_results(batches)
+                return None
+
+        self.logger.info("\n[步骤 6/8] 检查文档格式（与发布同时进行）...")
+
+        # 步骤 7: 发布博客文章
+        self.logger.info("\n[步骤 7/8] 发布博客文章...")
+        self._run_publish_stage(batches)
+
+        format_issues = self._record_format_scan(format_scan.result(), stats)
+        if format_issues > 0:
+            self.logger.warning(f"发现 {format_issues} 个文档存在格式问题，建议手动检查")
+        else:
+            self.logger.info("所有文档格式检查通过")
+
+        return batches
+
+    def _run_streaming_pipeline(self, stats, resume=False):
+        """流式处理：每个批次读取后独立地流经各个阶段
+
+        阶段之间用有界队列连接，批次 N 审查时批次 N+1 已在优化，
+        不必等整个积压队列完成一个阶段。严重隐私问题只拦截对应文档，
+        不影响其他文档发布。返回处理后的批次；没有新文档时返回 None。
+        """
+        self.logger.info("\n[流式模式] 读取文档并按批次流经各个阶段...")
+        documents = self.reader.collect_documents(resume)
+        if not documents:
+            self.logger.info("没有发现新文档，流程结束")
+            return None
+
+        processing = self.settings.get('processing', {})
+
+        def read_batches():
+            for batch in self.reader.iter_batches(
+                documents,
+                self.settings.get('system', {}).get('batch_size', 10),
+                self._save_snapshots()
+            ):
+                stats['total_documents'] += batch['count']
+                self._record_read([batch])
+                yield batch
+
+        def privacy_stage(batch):
+            self._run_privacy_stage([batch])
+            self._hold_critical_documents([batch])
+
+        def publish_stage(batch):
+            self._run_publish_stage([batch])
+
+        # 格式检查只读文档，在快照上与发布同时进行
+        stages = []
+        if processing.get('enable_title_optimization', True):
+            stages.append(('optimize', lambda batch: self._run_stage(self.optimizer, [batch], 'optimized', parallel=True), MUTATING))
+        if processing.get('enable_blog_enhancement', True):
+            stages.append(('enhance', lambda batch: self._run_stage(self.enhancer, [batch], 'enhanced', parallel=True), MUTATING))
+        if processing.get('enable_content_review', True):
+            stages.append(('review', lambda batch: self._run_stage(self.reviewer, [batch], 'reviewed', parallel=True), MUTATING))
+        if processing.get('enable_privacy_check', True):
+            stages.append(('privacy', privacy_stage, MUTATING))
+        stages.append(('format_check', self._scan_format, READ_ONLY))
+        stages.append(('publish', publish_stage, MUTATING))
+
+        scheduler = StreamingScheduler(
+            stages,
+            queue_size=self.settings.get('system', {}).get('pipeline_queue_size', 2),
+            logger=self.logger,
+            validators=self.validators
+        )
+        batches = scheduler.run(read_batches())
+        stats['errors'].extend(scheduler.errors)
+
+        format_issues = sum(
+            self._record_format_scan(results, stats) for _, results in scheduler.results.get('format_check', [])
+        )
+        if format_issues > 0:
+            self.logger.warning(f"发现 {format_issues} 个文档存在格式问题，建议手动检查")
+
+        self.logger.info(f"流式处理完成，共 {stats['total_documents']} 个文档，{len(batches)} 个批次")
+        return batches
+
+    def _run_privacy_stage(self, batches):
+        """隐私检测并为每个批次生成报告"""
+        self._run_stage(self.privacy_checker, batches, 'privacy_checked', parallel=True)
+        for batch in batches:
+            self.privacy_checker.write_report(batch['documents'], batch['batch_file'])
+
+    def _count_critical_issues(self, snapshots):
+        """统计包含严重隐私问题的文档数（只读校验）"""
+        return sum(1 for snapshot in snapshots if snapshot.has_critical_issues)
+
+    def _hold_critical_documents(self, batches):
+        """拦截包含严重隐私问题的文档，使其不会被发布"""
+        for batch in batches:
+            for doc in batch['documents']:
+                if doc.has_critical_issues:
+                    doc.fail('privacy_blocked', '包含严重隐私问题，已停止发布')
+                    self.logger.error(f"文档 {doc.filename or 'unknown'} 包含严重隐私问题，已停止发布")
+
+    def _scan_format(self, snapshots):
+        """检查文档快照的格式问题（只读校验），返回 [(文件名, 诊断列表)]，只包含有问题的文档
+
+        检查的是发布的完整文章（Front Matter 头部 + 正文），行号与发布的文件
+        一致；有头部时正文的结构模型与完整文章不一致，由 lint 重新解析。
+        """
+        results = []
+        for snapshot in snapshots:
+            diagnostics = self.format_linter.lint(snapshot.front_matter + snapshot.content, snapshot.markdown)
+            if diagnostics:
+                results.append((snapshot.filename, diagnostics))
+        return results
+
+    def _record_format_scan(self, results, stats):
+        """记录格式检查结果，汇总到 stats['format_diagnostics']，返回存在问题的文档数"""
+        summary = stats.setdefault('format_diagnostics', {'documents_with_issues': 0, 'by_rule': {}, 'documents': []})
+        for filename, diagnostics in results:
+            self.logger.warning(f"文档 {filename} 存在格式问题")
+            for diagnostic in diagnostics:
+                self.logger.warning(f"  - 第 {diagnostic.line} 行第 {diagnostic.column} 列 [{diagnostic.rule}] {diagnostic.message}")
+                summary['by_rule'][diagnostic.rule] = summary['by_rule'].get(diagnostic.rule, 0) + 1
+            summary['documents'].append({
+                'filename': filename,
+                'diagnostics': [diagnostic._asdict() for diagnostic in diagnostics]
+            })
+
+        summary['documents_with_issues'] += len(results)
+        return len(results)
+
+    def _run_publish_stage(self, batches):
+        """发布文档（发布记录保存在状态库中）"""
+        self._run_stage(self.publisher, batches, 'published')
+
+    def _record_read(self, batches):
+        """把刚读取的文档记录为 read 阶段检查点"""
+        for batch in batches:
+            documents = [doc for doc in batch['documents'] if doc.status == 'read']
+            self.store.record_stage('read', documents, batch['batch_file'])
+
+    def _record_results(self, batches):
+        """把各文档的最终状态写回已处理文档清单"""
+        self.reader.record_results(doc for batch in batches for doc in batch['documents'])
+
+    def _save_snapshots(self):
+        """是否在每个阶段后保存批次快照文件（用于调试或检查点）"""
+        return self.settings.get('system', {}).get('save_batch_snapshots', False)
+
+    def _run_stage(self, stage, batches, stage_name, parallel=False):
+        """在内存中对所有批次执行一个处理阶段
+
+        文档对象直接在阶段之间传递；只有开启 save_batch_snapshots 时
+        才把阶段结果写入 batch_*_<stage>.jsonl。parallel 为 True 时由
+        进程池并行处理，结果顺序不变。每个文档的阶段输出和各自的处理耗时
+        都记录到状态库中。
+        """
+        started_at = datetime.now().isoformat()
+
+        if self.stage_cache is not None and StageCache.is_cacheable(stage):
+            results = self._run_cached_stage(stage, batches, stage_name, parallel)
+        elif parallel:
+            results = self.executor.map_documents(stage, [batch['documents'] for batch in batches])
+        else:
+            results = [process_timed(stage, batch['documents']) for batch in batches]
+
+        for batch, (documents, durations) in zip(batches, results):
+            batch['documents'] = documents
+            self.store.record_stage(stage_name, documents, batch['batch_file'], started_at, durations)
+
+            if self._save_snapshots():
+                snapshot_file = stage_batch_file(batch['batch_file'], stage_name)
+                try:
+                    save_batch(batch['documents'], snapshot_file)
+                    self.logger.debug(f"批次快照已保存到: {snapshot_file}")
+                except Exception as e:
+                    self.logger.warning(f"保存批次快照失败 {snapshot_file}: {e}")
+
+        return batches
+
+    def _run_cached_stage(self, stage, batches, stage_name, parallel):
+        """先从阶段缓存取出已有的输出，只把未命中的文档交给阶段处理
+
+        返回与 ParallelExecutor.map_documents 相同结构的结果（每个批次一个
+        (文档列表, 各文档耗时)，顺序不变）；命中缓存的文档耗时为写回缓存
+        输出的时间，不需要处理的文档耗时为 0。
+        """
+        results = []
+        misses = []
+        for batch in batches:
+            documents = list(batch['documents'])
+            durations = [0.0] * len(documents)
+            pending = []
+            for index, doc in enumerate(documents):
+                if doc.status != stage.INPUT_STATUS:
+                    continue
+                start = time.perf_counter()
+                try:
+                    hit, state = self.stage_cache.apply(stage, stage_name, doc)
+                except Exception as e:
+                    self.logger.warning(f"读取阶段缓存失败 {doc.filename or 'unknown'}: {e}")
+                    hit, state = False, None
+                durations[index] = time.perf_counter() - start
+                if not hit:
+                    pending.append((index, state))
+            results.append((documents, durations))
+            misses.append(pending)
+
+        to_process = [[results[i][0][index] for index, _ in pending] for i, pending in enumerate(misses)]
+        if any(to_process):
+            if parallel:
+                processed = self.executor.map_documents(stage, to_process)
+            else:
+                processed = [process_timed(stage, documents) for documents in to_process]
 
-    def _check_format_issues(self, content):
-        """检查文档是否存在格式问题"""
-        issues = []
-
-        # 检查1: Front Matter 是否损坏
-        if '---' in content:
-            parts = content.split('---', 3)
-            if len(parts) >= 3:
-                front_matter = parts[1]
-                # 检查是否有表格内容混入
-                if '|' in front_matter and '---' in front_matter:
-                    issues.append("Front Matter 可能包含表格内容")
-                # 检查是否有非法字符
-                if '------' in front_matter or '--------' in front_matter:
-                    issues.append("Front Matter 包含过多的横线")
-
-        # 检查2: 摘要是否过长
-        excerpt_match = re.search(r'^excerpt:\s*(.+)$', content, re.MULTILINE)
-        if excerpt_match:
-            excerpt = excerpt_match.group(1).strip()
-            if len(excerpt) > 200:
-                issues.append(f"摘要过长 ({len(excerpt)} 字符)")
-
-        # 检查3: 是否有重复的标题
-        lines = content.split('\n')
-        titles = []
-        for line in lines:
-            line = line.strip()
-            if line.startswith('# '):
-                title = line[2:].strip()
-                if title in titles:
-                    issues.append(f"重复的标题: {title}")
-                titles.append(title)
-
-        # 检查4: 代码块格式
-        code_blocks = re.findall(r'```(\w*)', content)
-        code_block_ends = content.count('```')
-        if len(code_blocks) * 2 != code_block_ends:
-            issues.append("代码块标记不匹配")
-
-        # 检查5: 表格格式
-        tables = re.findall(r'^\|.*\|$', content, re.MULTILINE)
-        if tables:
-            for table in tables:
-                if not re.search(r'\|[\s\-]+\|', table):
-                    issues.append("表格缺少分隔行")
-
-        return len(issues) > 0
+            for (documents, durations), pending, (outputs, elapsed) in zip(results, misses, processed):
+                for (index, state), doc, seconds in zip(pending, outputs, elapsed):
+                    documents[index] = doc
+                    durations[index] += seconds
+                    if state is None:
+                        continue
+                    try:
+                        self.stage_cache.store(stage_name, state, doc)
+                    except Exception as e:
+                        self.logger.warning(f"写入阶段缓存失败 {doc.filename or 'unknown'}: {e}")
+
+        return results
 
     def _generate_report(self, stats):
         """生成处理报告"""
+        if self.stage_cache is not None:
+            stats['stage_cache'] = self.stage_cache.stats
         report_file = Path(f"logs/auto_post_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
         with open(report_file, 'w', encoding='utf-8') as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)
@@ -263,6 +461,7 @@ class AutoPostSystem:
             # 删除批次文件（可选）
             if self.settings.get('cleanup_temp_files', True):
                 temp_patterns = [
+                    'batch_*.jsonl',
                     'batch_*.json',
                     'batch_*_optimized.json',
                     'batch_*_enhanced.json',
@@ -289,6 +488,10 @@ def main():
     parser.add_argument('--test-local', action='store_true', help='测试本地服务器')
     parser.add_argument('--deploy', action='store_true', help='部署到远程')
     parser.add_argument('--batch-size', type=int, help='批次大小')
+    parser.add_argument('--streaming', action='store_true', help='流式模式：每个批次独立流经各阶段')
+    parser.add_argument('--resume', action='store_true', help='从各文档最近一次成功的阶段继续上次失败的运行')
+    parser.add_argument('--list-status', metavar='STATUS', help='列出状态库中处于指定状态的文档后退出')
+    parser.add_argument('--save-snapshots', action='store_true', help='保存每个阶段的批次快照文件（调试用）')
 
     args = parser.parse_args()
 
@@ -305,9 +508,19 @@ def main():
         system.settings.setdefault('processing', {})['enable_auto_deploy'] = True
     if args.batch_size:
         system.settings['system']['batch_size'] = args.batch_size
+    if args.streaming:
+        system.settings.setdefault('system', {})['pipeline_mode'] = 'streaming'
+    if args.save_snapshots:
+        system.settings.setdefault('system', {})['save_batch_snapshots'] = True
+
+    # 查询状态库
+    if args.list_status:
+        for record in system.store.documents_by_status(args.list_status):
+            print(f"{record['relative_path']}\t{record['status']}\t{record['updated_at']}")
+        sys.exit(0)
 
     # 运行流程
-    stats = system.run_full_pipeline()
+    stats = system.run_full_pipeline(resume=args.resume)
 
     # 设置退出码
     sys.exit(0 if stats.get('success', False) else 1)
@@ -0,0 +1,183 @@
+"""性能基准测试脚本
+
+用法（在 auto-post 目录下运行）：
+    python scripts/benchmark.py [--docs N] [--repeat N] privacy [--extra-patterns N ...]
+    python scripts/benchmark.py [--repeat N] normalize [--posts DIR]
+
+--config、--docs、--repeat 是公共选项，写在子命令之前。
+"""
+import argparse
+import json
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import os
+from pathlib import Path
+
+# 添加 scripts 目录到 Python 路径
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(script_dir, 'scripts'))
+
+from utils import load_config
+
+WORDS = ['部署', '配置', '服务', '缓存', '性能', '测试', 'Python', 'Docker', 'Redis', 'API', 'MySQL', 'Git']
+
+def generate_documents(count, seed=0):
+    """生成测试文档：正文、代码块、链接和少量敏感内容"""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        lines = [f'# 文档{i}']
+        for section in range(8):
+            lines.append(f'## 第{section}节')
+            for _ in range(6):
+                lines.append(' '.join(rng.choice(WORDS) for _ in range(20)) + '。')
+            if rng.random() < 0.5:
+                lines.append(f'参考 https://github.com/example/repo{section} 和 https://docs.python.org/3/')
+            if rng.random() < 0.4:
+                lines.extend(['```python', 'def handler(event):', '    return {"status": 200}', '```'])
+            if rng.random() < 0.1:
+                lines.append(f'联系 user{i}@corp.io，服务器 10.0.{section}.1')
+        documents.append('\n'.join(lines) + '\n')
+    return documents
+
+def time_per_document(func, documents, repeat):
+    """返回每个文档的平均耗时（毫秒），取多次运行的最小值"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for content in documents:
+            func(content)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(documents) * 1000
+
+def benchmark_privacy(args):
+    """隐私扫描：在 privacy.json 中追加模式，比较逐个模式扫描和合并扫描的耗时"""
+    from privacy_checker import PrivacyChecker
+
+    base_config = load_config(Path(args.config) / 'privacy.json')
+    documents = generate_documents(args.docs)
+    print(f"隐私扫描基准：{len(documents)} 个文档，平均 {sum(map(len, documents)) // len(documents)} 字符")
+    print(f"{'模式数':>8} {'逐个扫描(ms/文档)':>18} {'合并扫描(ms/文档)':>18} {'完整检测(ms/文档)':>18} {'平均参与扫描的模式':>16}")
+
+    for extra in args.extra_patterns:
+        config = json.loads(json.dumps(base_config))
+        config['sensitive_patterns']['custom_tokens'] = [f'tok{i:03d}_[a-z0-9]{{24}}' for i in range(extra)]
+
+        config_dir = tempfile.mkdtemp()
+        try:
+            with open(Path(config_dir) / 'privacy.json', 'w', encoding='utf-8') as f:
+                json.dump(config, f, ensure_ascii=False)
+            checker = PrivacyChecker(config_dir)
+        finally:
+            shutil.rmtree(config_dir)
+
+        # 逐个模式扫描：每个模式、链接和Base64各扫描整篇文档一次（只统计匹配）
+        separate = [
+            re.compile(pattern, re.IGNORECASE | re.DOTALL)
+            for patterns in config['sensitive_patterns'].values() for pattern in patterns
+        ] + [re.compile(checker.URL_PATTERN), re.compile(checker.BASE64_PATTERN)]
+
+        def scan_separately(content):
+            for pattern in separate:
+                for _ in pattern.finditer(content):
+                    pass
+
+        # 合并扫描：只遍历匹配；完整检测：包括分派处理和屏蔽
+        def scan_merged(content):
+            for _ in checker.scanner.finditer(content):
+                pass
+
+        pattern_count = len(separate)
+        separate_ms = time_per_document(scan_separately, documents, args.repeat)
+        merged_ms = time_per_document(scan_merged, documents, args.repeat)
+        full_ms = time_per_document(checker.mask_sensitive_content, documents, args.repeat)
+        # 锚点预筛选后实际参与正则扫描的模式数
+        active = sum(len(checker.scanner.active_patterns(content)) for content in documents) / len(documents)
+        print(f"{pattern_count:>8} {separate_ms:>18.3f} {merged_ms:>18.3f} {full_ms:>18.3f} {active:>16.1f}")
+
+def legacy_fix_markdown_formatting(content, normalize_code_lang):
+    """原来逐条正则替换的 FormatChecker.fix_markdown_formatting（对照用）"""
+    content = re.sub(r'^(#{1,6})([^\s#])', r'\1 \2', content, flags=re.MULTILINE)
+    content = re.sub(r'^(\s*)(\d+)([^\s.])', r'\1\2. \3', content, flags=re.MULTILINE)
+    content = re.sub(r'^(\s*)([-*+])([^\s])', r'\1\2 \3', content, flags=re.MULTILINE)
+
+    fixed_lines = []
+    in_table = False
+    for line in content.split('\n'):
+        if '|' in line and not line.strip().startswith('```'):
+            in_table = True
+            fixed_lines.append(line)
+        else:
+            if in_table:
+                fixed_lines.append('')
+                in_table = False
+            fixed_lines.append(line)
+
+    content = '\n'.join(fixed_lines)
+    content = re.sub(r'```(\w*)', lambda m: f"```{normalize_code_lang(m.group(1))}", content)
+    content = re.sub(r'\[([^\]]+)\]\s*\(\s*([^)]+)\s*\)', r'[\1](\2)', content)
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    return content
+
+def load_posts(posts_dir):
+    """读取已发布文章作为测试语料"""
+    return [path.read_text(encoding='utf-8') for path in sorted(Path(posts_dir).rglob('*.md'))]
+
+def benchmark_normalize(args):
+    """Markdown 格式修正：比较原来的逐条替换和逐行一次遍历的吞吐量"""
+    from format_checker import FormatChecker
+
+    checker = FormatChecker(args.config)
+    documents = load_posts(args.posts)
+    source = args.posts
+    if not documents:
+        documents = generate_documents(args.docs)
+        source = '生成的文档'
+    total_bytes = sum(len(content.encode('utf-8')) for content in documents)
+    print(f"格式修正基准：{source}，{len(documents)} 个文档，共 {total_bytes / 1024:.0f} KB")
+
+    mismatches = sum(
+        1 for content in documents
+        if checker.fix_markdown_formatting(content) != legacy_fix_markdown_formatting(content, checker._normalize_code_lang)
+    )
+
+    legacy_ms = time_per_document(
+        lambda content: legacy_fix_markdown_formatting(content, checker._normalize_code_lang), documents, args.repeat
+    )
+    fused_ms = time_per_document(checker.fix_markdown_formatting, documents, args.repeat)
+    for name, ms in (('逐条替换', legacy_ms), ('逐行一次遍历', fused_ms)):
+        throughput = total_bytes / (ms * len(documents) / 1000) / 1024 / 1024
+        print(f"{name:>10}: {ms:8.3f} ms/文档 {throughput:8.1f} MB/s")
+    print(f"结果不一致的文档: {mismatches}")
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试')
+    parser.add_argument('--config', default='config', help='配置文件目录')
+    parser.add_argument('--docs', type=int, default=200, help='测试文档数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最快一次）')
+    subparsers = parser.add_subparsers(dest='benchmark')
+
+    privacy = subparsers.add_parser('privacy', help='隐私扫描耗时随模式数的变化')
+    privacy.add_argument('--extra-patterns', type=int, nargs='+', default=[0, 25, 50, 100, 200],
+                         help='在 privacy.json 中追加的模式数')
+    privacy.set_defaults(func=benchmark_privacy)
+
+    normalize = subparsers.add_parser('normalize', help='Markdown 格式修正的吞吐量')
+    normalize.add_argument('--posts', default='../source/_posts',
+                           help='测试语料目录（没有文章时使用生成的文档）')
+    normalize.set_defaults(func=benchmark_normalize)
+
+    args = parser.parse_args()
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return
+    Path('logs').mkdir(exist_ok=True)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,17 @@ import os
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger, count_words
+from utils import setup_logger, count_words, transform_batch, stage_batch_file
+from markdown_model import parse_markdown
+from result_cache import fingerprint
 
 class BlogEnhancer:
     """博客增强器"""
 
+    # 阶段缓存：处理的文档状态和处理逻辑版本（逻辑变化时递增，使缓存失效）
+    INPUT_STATUS = 'optimized'
+    STAGE_VERSION = 1
+
     def __init__(self, config_dir):
         self.logger = setup_logger('BlogEnhancer', 'logs/blog-enhancer.log')
         self.config_dir = Path(config_dir)
@@ -89,10 +95,11 @@ class BlogEnhancer:
 
         return excerpt
 
-    def add_table_of_contents(self, content):
-        """添加目录（如果文档结构复杂）"""
-        # 提取所有标题
-        headers = re.findall(r'^(#{1,6})\s+(.+)$', content, re.MULTILINE)
+    def add_table_of_contents(self, content, model=None):
+        """添加目录（如果文档结构复杂，model 为 content 的 Markdown 结构模型，可选）"""
+        # 提取所有标题（代码块中的 # 注释不算标题）
+        model = parse_markdown(content, model)
+        headers = model.headings
 
         # 如果标题少于3个，不添加目录
         if len(headers) < 3:
@@ -100,10 +107,11 @@ class BlogEnhancer:
 
         # 生成目录
         toc_lines = ["## 目录\n"]
-        for level, title in headers:
-            if level == '#':  # 跳过一级标题
+        for header in headers:
+            level, title = header.level, header.title
+            if level == 1:  # 跳过一级标题
                 continue
-            indent = '  ' * (len(level) - 2)
+            indent = '  ' * (level - 2)
             # 生成锚点链接
             anchor = re.sub(r'[^\w\u4e00-\u9fff\s-]', '', title).strip()
             anchor = re.sub(r'[-\s]+', '-', anchor)
@@ -112,7 +120,11 @@ class BlogEnhancer:
         toc = '\n'.join(toc_lines) + '\n\n'
 
         # 在第一个二级标题前插入目录
-        first_h2_pos = content.find('\n## ')
+        first_h2_pos = next(
+            (model.line_starts[header.line] - 1 for header in headers
+             if header.line > 0 and model.lines[header.line].startswith('## ')),
+            -1
+        )
         if first_h2_pos > 0:
             return content[:first_h2_pos] + '\n' + toc + content[first_h2_pos:]
         else:
@@ -125,12 +137,12 @@ class BlogEnhancer:
         reading_time = max(1, round(word_count / 200))
         return reading_time
 
-    def add_meta_data(self, doc_info):
+    def add_meta_data(self, doc):
         """添加博客元数据"""
         try:
-            content = doc_info['optimized_content']
-            title = doc_info['optimized_title']
-            tags = doc_info['tags']
+            content = doc.content
+            title = doc.optimized_title
+            tags = doc.tags
 
             # 确定分类
             category = self.determine_category(title, tags, content)
@@ -142,9 +154,9 @@ class BlogEnhancer:
             reading_time = self.add_reading_time(content)
 
             # 添加目录（如果需要）
-            content_with_toc = self.add_table_of_contents(content)
+            content_with_toc = self.add_table_of_contents(content, doc.markdown)
 
-            # 生成Hexo Front Matter
+            # 生成Hexo Front Matter（只保存头部，发布时与当前正文拼接）
             front_matter = f"""---
 title: {title}
 date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -163,54 +175,57 @@ reading_time: {reading_time} 分钟
 
 <!-- more -->
 
-{content_with_toc}"""
+"""
 
             # 更新文档信息
-            doc_info.update({
-                'category': category,
-                'excerpt': excerpt,
-                'reading_time': reading_time,
-                'front_matter': front_matter,
-                'blog_content': content_with_toc,
-                'enhancement_time': datetime.now().isoformat(),
-                'status': 'enhanced'
-            })
+            doc.category = category
+            doc.excerpt = excerpt
+            doc.reading_time = reading_time
+            doc.front_matter = front_matter
+            doc.enhancement_time = datetime.now().isoformat()
+            doc.update_content(content_with_toc, 'enhanced')
+            doc.complete_stage('enhanced')
 
             self.logger.info(f"博客增强完成: {title} (分类: {category}, 标签: {len(tags)}, 阅读时间: {reading_time}分钟)")
-            return doc_info
-
-        except Exception as e:
-            self.logger.error(f"博客增强失败 {doc_info.get('filename', 'unknown')}: {e}")
-            doc_info['status'] = 'enhancement_failed'
-            doc_info['error'] = str(e)
-            return doc_info
-
-    def process_batch(self, batch_file):
-        """处理一批文档"""
-        self.logger.info(f"开始增强批次: {batch_file}")
+            return doc
 
-        # 加载优化后的批次文件
-        try:
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
         except Exception as e:
-            self.logger.error(f"加载批次文件失败: {e}")
-            return None
-
-        # 处理每个文档
+            self.logger.error(f"博客增强失败 {doc.filename or 'unknown'}: {e}")
+            doc.fail('enhancement_failed', e)
+            return doc
+
+    def cache_fingerprint(self):
+        """影响阶段输出的配置指纹"""
+        return fingerprint(self.categories)
+
+    def refresh_cached(self, doc):
+        """使用缓存的输出时重新生成时间戳（包括 Front Matter 中的日期）"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if doc.front_matter:
+            doc.front_matter = re.sub(
+                r'^(date|updated): .*$', lambda m: f'{m.group(1)}: {now}', doc.front_matter, flags=re.MULTILINE
+            )
+        doc.enhancement_time = datetime.now().isoformat()
+
+    def process_documents(self, documents):
+        """增强一组文档（在内存中处理，不读写批次文件）"""
         enhanced_docs = []
         for doc in documents:
-            if doc.get('status') == 'optimized':
+            if doc.status == self.INPUT_STATUS:
                 enhanced_doc = self.add_meta_data(doc)
                 enhanced_docs.append(enhanced_doc)
             else:
                 enhanced_docs.append(doc)
+        return enhanced_docs
+
+    def process_batch(self, batch_file):
+        """处理一批文档"""
+        self.logger.info(f"开始增强批次: {batch_file}")
 
-        # 保存增强后的批次
-        enhanced_batch_file = batch_file.replace('_optimized.json', '_enhanced.json')
+        # 逐个文档处理并写入增强后的批次
+        enhanced_batch_file = stage_batch_file(batch_file, 'enhanced')
         try:
-            with open(enhanced_batch_file, 'w', encoding='utf-8') as f:
-                json.dump(enhanced_docs, f, ensure_ascii=False, indent=2)
+            transform_batch(batch_file, enhanced_batch_file, self.process_documents)
 
             self.logger.info(f"批次增强完成，已保存到: {enhanced_batch_file}")
             return enhanced_batch_file
@@ -236,7 +251,7 @@ if __name__ == "__main__":
     enhancer = BlogEnhancer('config')
 
     # 查找优化后的批次文件
-    batch_files = list(Path('.').glob('batch_*_optimized.json'))
+    batch_files = list(Path('.').glob('batch_*_optimized.jsonl'))
     if batch_files:
         enhanced = enhancer.run([str(f) for f in batch_files])
         print(f"\n成功增强 {len(enhanced)} 个批次")
@@ -0,0 +1,218 @@
+"""文档模型"""
+import difflib
+
+from markdown_model import MarkdownModel
+
+# 逐行比较时最多允许的增删行数，超过时改用较粗的 difflib 结果
+MAX_DIFF_EDITS = 200
+
+def _shortest_edit(a, b, max_edits):
+    """Myers 算法求 a 到 b 的最少增删，返回 [(a 中位置, b 中位置或 None), ...]
+
+    b 中位置为 None 表示删除 a 的该行，否则表示在 a 的该位置前插入 b 的
+    该行。耗时与 (行数 × 增删行数) 成正比，与重复行多少无关；增删超过
+    max_edits 行时返回 None。
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(max_edits + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+def _backtrack(trace, x, y):
+    """从终点 (x, y) 沿每一步的来源倒推出增删（trace[d] 为第 d 步之前的状态）"""
+    edits = []
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        prev_k = k + 1 if k == -d or (k != d and v[k - 1] < v[k + 1]) else k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        edits.append((prev_x, prev_y if prev_k == k + 1 else None))
+        x, y = prev_x, prev_y
+    edits.reverse()
+    return edits
+
+def line_edits(old_lines, new_lines):
+    """把 old_lines 变成 new_lines 的修改列表 [[起始行, 结束行, 新行列表], ...]
+
+    先去掉相同的开头和结尾，只比较中间部分：行数相同时逐行对比（各阶段
+    大多只原地修改若干行），否则用 Myers 算法求最少增删。增删很多时改用
+    difflib 的 autojunk 模式，结果可能把较大的区间整体替换，但仍然准确。
+    """
+    end = min(len(old_lines), len(new_lines))
+    start = 0
+    while start < end and old_lines[start] == new_lines[start]:
+        start += 1
+    old_end, new_end = len(old_lines), len(new_lines)
+    while old_end > start and new_end > start and old_lines[old_end - 1] == new_lines[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+
+    ops = []
+    if old_end == new_end:
+        for i in range(start, old_end):
+            if old_lines[i] == new_lines[i]:
+                continue
+            if ops and ops[-1][1] == i:
+                ops[-1][1] = i + 1
+                ops[-1][2].append(new_lines[i])
+            else:
+                ops.append([i, i + 1, [new_lines[i]]])
+        return ops
+
+    old_middle = old_lines[start:old_end]
+    new_middle = new_lines[start:new_end]
+    edits = _shortest_edit(old_middle, new_middle, MAX_DIFF_EDITS)
+    if edits is None:
+        matcher = difflib.SequenceMatcher(None, old_middle, new_middle)
+        return [
+            [start + i1, start + i2, new_middle[j1:j2]]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+        ]
+
+    for x, y in edits:
+        if not ops or ops[-1][1] != start + x:
+            ops.append([start + x, start + x, []])
+        if y is None:
+            ops[-1][1] += 1
+        else:
+            ops[-1][2].append(new_middle[y])
+    return ops
+
+class Document:
+    """在各阶段之间传递的文档
+
+    使用 __slots__ 保存固定字段，不再为每个文档维护一个字典，数千个文档
+    在同一进程中处理时占用更少内存、属性访问更快。行数、Markdown
+    结构模型等派生字段在第一次访问时计算并缓存，正文变化时失效，进程间
+    传递时也不序列化。
+    """
+
+    # 需要序列化的字段（按阶段分组）
+    FIELDS = (
+        # 源文件
+        'path', 'relative_path', 'filename', 'size', 'mtime_ns', 'modified',
+        'encoding', 'sha256', 'read_time',
+        # 正文和各阶段的修改记录
+        'content', 'edits', 'front_matter',
+        # 状态
+        'status', 'error', 'stages_completed',
+        # 优化
+        'original_title', 'optimized_title', 'slug', 'summary', 'tags', 'optimization_time',
+        # 增强
+        'category', 'excerpt', 'reading_time', 'enhancement_time',
+        # 审查
+        'corrections', 'warnings', 'review_time',
+        # 隐私检测
+        'privacy_detections', 'severity_count', 'has_critical_issues', 'privacy_metrics',
+        'privacy_check_time',
+        # 格式检查
+        'format_changes_made', 'format_check_time',
+        # 发布
+        'post_file', 'post_filename', 'publish_time',
+    )
+
+    __slots__ = tuple(name for name in FIELDS if name != 'content') + ('_content', '_lines', '_markdown')
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, fields.get(name))
+        if self.edits is None:
+            self.edits = []
+        if self.stages_completed is None:
+            self.stages_completed = []
+
+    @classmethod
+    def from_dict(cls, data):
+        """从批次文件或状态库中的字典创建文档（忽略未知字段）"""
+        return cls(**data)
+
+    def to_dict(self):
+        """转换为可序列化的字典（省略未设置的字段）"""
+        data = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"Document({self.relative_path!r}, status={self.status!r})"
+
+    @property
+    def content(self):
+        """当前正文"""
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self._lines = None
+        self._markdown = None
+
+    @property
+    def lines(self):
+        """正文行数（按需计算）"""
+        if self._lines is None:
+            self._lines = (self._content or '').count('\n') + 1
+        return self._lines
+
+    @property
+    def markdown(self):
+        """正文的 Markdown 结构模型（按需解析）"""
+        if self._markdown is None:
+            self._markdown = MarkdownModel(self._content or '')
+        return self._markdown
+
+    @property
+    def parsed_markdown(self):
+        """已经解析的结构模型，尚未解析时为 None（不触发解析）"""
+        return self._markdown
+
+    def complete_stage(self, status):
+        """标记一个阶段处理成功"""
+        self.status = status
+        self.error = None
+        self.stages_completed.append(status)
+
+    def fail(self, status, error):
+        """标记一个阶段处理失败"""
+        self.status = status
+        self.error = str(error)
+
+    def update_content(self, new_content, stage):
+        """替换正文，并记录本阶段的行级修改
+
+        文档只保存一份当前正文，各阶段的修改以
+        {'stage': 阶段, 'ops': [[起始行, 结束行, 新行列表], ...]} 的形式追加到
+        edits 中：把上一版本的 [起始行, 结束行) 替换为新行（行号都相对上一版本）。
+        记录只包含新文本，不保存被替换的旧文本（避免屏蔽前的敏感内容留在批次
+        文件和状态库中），从源文件（sha256）开始依次应用即可重现各阶段的正文。
+        """
+        old_content = self._content or ''
+        self.content = new_content
+        if new_content == old_content:
+            return
+
+        ops = line_edits(old_content.split('\n'), new_content.split('\n'))
+        self.edits.append({'stage': stage, 'ops': ops})
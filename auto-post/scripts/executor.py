@@ -0,0 +1,102 @@
+"""多进程批次执行器"""
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# 工作进程内缓存的阶段实例，键为 (阶段类, 配置目录)
+_worker_stages = {}
+
+def process_timed(stage, documents):
+    """逐个文档执行 stage.process_documents，返回 (文档列表, 各文档耗时)"""
+    processed = []
+    durations = []
+    for doc in documents:
+        start = time.perf_counter()
+        processed.extend(stage.process_documents([doc]))
+        durations.append(time.perf_counter() - start)
+    return processed, durations
+
+def _process_chunk(stage_cls, config_dir, documents):
+    """在工作进程中处理一组文档"""
+    key = (stage_cls, str(config_dir))
+    stage = _worker_stages.get(key)
+    if stage is None:
+        stage = stage_cls(config_dir)
+        _worker_stages[key] = stage
+    return process_timed(stage, documents)
+
+class ParallelExecutor:
+    """并行执行各阶段的 process_documents
+
+    工作进程数由 settings.system.max_parallel_batches 限制。批次数少于
+    工作进程数时会把批次再拆成文档组，让所有进程都有活干。结果始终按
+    输入顺序返回，和串行执行完全一致。
+    """
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max(1, int(max_workers or 1))
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        """按需创建进程池（流式调度时多个阶段线程共享）
+
+        工作进程用 spawn 方式启动：进程池第一次使用时读取线程、其他阶段
+        线程和校验线程池都在运行，fork 出的子进程可能继承被占用的日志锁
+        或队列锁而卡死。
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _split_chunks(self, document_lists):
+        """把各批次拆分成文档组，返回 (批次序号, 文档组) 列表"""
+        total = sum(len(documents) for documents in document_lists)
+        if len(document_lists) >= self.max_workers:
+            chunk_size = max(total, 1)
+        else:
+            chunk_size = max(1, math.ceil(total / self.max_workers))
+
+        chunks = []
+        for index, documents in enumerate(document_lists):
+            for start in range(0, len(documents), chunk_size):
+                chunks.append((index, documents[start:start + chunk_size]))
+        return chunks
+
+    def map_documents(self, stage, document_lists):
+        """对每个文档列表执行 stage.process_documents
+
+        返回与输入对应的 [(文档列表, 各文档耗时), ...]，耗时在处理文档的
+        进程中逐个测量。
+        """
+        total = sum(len(documents) for documents in document_lists)
+        if self.max_workers <= 1 or total <= 1:
+            return [process_timed(stage, documents) for documents in document_lists]
+
+        chunks = self._split_chunks(document_lists)
+        results = self._get_pool().map(
+            _process_chunk,
+            repeat(type(stage)),
+            repeat(stage.config_dir),
+            [documents for _, documents in chunks]
+        )
+
+        # 按原顺序重新拼装各批次
+        processed = [([], []) for _ in document_lists]
+        for (index, _), (documents, durations) in zip(chunks, results):
+            processed[index][0].extend(documents)
+            processed[index][1].extend(durations)
+        return processed
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
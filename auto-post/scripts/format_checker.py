@@ -1,6 +1,5 @@
 """文档格式检查和修正脚本"""
 import re
-import json
 from pathlib import Path
 import sys
 import os
@@ -10,14 +9,40 @@ from datetime import datetime
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger
+from utils import setup_logger, transform_batch, stage_batch_file
+from markdown_model import parse_markdown, LineNormalizer
 
 class FormatChecker:
     """文档格式检查器"""
 
+    # 代码语言标识的标准写法
+    CODE_LANGUAGES = {
+        'js': 'javascript',
+        'py': 'python',
+        'sh': 'bash',
+        'html': 'html',
+        'css': 'css',
+        'json': 'json',
+        'xml': 'xml',
+        'sql': 'sql',
+        'java': 'java',
+        'cpp': 'cpp',
+        'c': 'c'
+    }
+
+    # 链接文字和地址两侧多余的空白（可以跨行）
+    LINK_PATTERN = re.compile(r'\[([^\]]+)\]\s*\(\s*([^)]+)\s*\)')
+
     def __init__(self, config_dir):
         self.logger = setup_logger('FormatChecker', 'logs/format-checker.log')
         self.config_dir = Path(config_dir)
+
+        # 标题、列表、表格后空行、代码块语言和多余空行一次遍历完成
+        self.normalizer = LineNormalizer(
+            code_language=self._normalize_code_lang,
+            table_spacing=True,
+            squash_blank_lines=True
+        )
         self.logger.info("文档格式检查器初始化完成")
 
     def fix_front_matter(self, content):
@@ -193,11 +218,11 @@ reading_time: 1 分钟
         body = body.lstrip('\n')
 
         # 移除重复的标题（如果已在 Front Matter 中）
-        lines = body.split('\n')
+        model = parse_markdown(body)
         cleaned_lines = []
         skip_first_title = False
 
-        for i, line in enumerate(lines):
+        for i, line in enumerate(model.lines):
             stripped = line.strip()
 
             # 跳过第一个标题（因为已在 Front Matter 中）
@@ -213,7 +238,7 @@ reading_time: 1 分钟
                     line = stripped[0] + ' ' + stripped[1:].strip()
 
             # 确保代码块格式
-            if stripped.startswith('```'):
+            if model.is_fence(i):
                 # 确保代码块前后有空行
                 if cleaned_lines and cleaned_lines[-1].strip():
                     cleaned_lines.append('')
@@ -226,80 +251,31 @@ reading_time: 1 分钟
         return '\n'.join(cleaned_lines)
 
     def fix_markdown_formatting(self, content):
-        """修正 Markdown 格式"""
-        # 1. 确保标题后有正确空格
-        content = re.sub(r'^(#{1,6})([^\s#])', r'\1 \2', content, flags=re.MULTILINE)
-
-        # 2. 修正列表格式
-        # 有序列表
-        content = re.sub(r'^(\s*)(\d+)([^\s.])', r'\1\2. \3', content, flags=re.MULTILINE)
-        # 无序列表
-        content = re.sub(r'^(\s*)([-*+])([^\s])', r'\1\2 \3', content, flags=re.MULTILINE)
-
-        # 3. 确保表格格式正确
-        lines = content.split('\n')
-        fixed_lines = []
-        in_table = False
-
-        for line in lines:
-            # 检测表格
-            if '|' in line and not line.strip().startswith('```'):
-                if not in_table:
-                    # 表格开始
-                    in_table = True
-                    fixed_lines.append(line)
-                else:
-                    # 检查是否是分隔行
-                    if re.match(r'^[\s\|\-\:]+$', line):
-                        # 确保分隔行格式正确
-                        fixed_lines.append(line)
-                    else:
-                        # 普通表格行
-                        fixed_lines.append(line)
-            else:
-                if in_table:
-                    # 表格结束，添加空行
-                    fixed_lines.append('')
-                    in_table = False
-                fixed_lines.append(line)
-
-        # 4. 确保代码块语言正确
-        content = '\n'.join(fixed_lines)
-        content = re.sub(r'```(\w*)', lambda m: f"```{self._normalize_code_lang(m.group(1))}", content)
-
-        # 5. 修复链接格式
-        content = re.sub(r'\[([^\]]+)\]\s*\(\s*([^)]+)\s*\)', r'[\1](\2)', content)
-
-        # 6. 移除多余的空行
-        content = re.sub(r'\n{3,}', '\n\n', content)
+        """修正 Markdown 格式
 
-        return content
+        行级规则（标题和列表标记后的空格、表格后的空行、代码块语言、多余
+        空行）由 self.normalizer 逐行一次完成。链接可以跨行，仍对整篇文本
+        替换一次；它只删除括号旁的空白，与压缩空行的先后顺序不影响结果。
+        """
+        content = self.normalizer.normalize(content)
+        return self.LINK_PATTERN.sub(r'[\1](\2)', content)
 
     def _normalize_code_lang(self, lang):
         """标准化代码语言标识"""
-        lang_map = {
-            'js': 'javascript',
-            'py': 'python',
-            'sh': 'bash',
-            'html': 'html',
-            'css': 'css',
-            'json': 'json',
-            'xml': 'xml',
-            'sql': 'sql',
-            'java': 'java',
-            'cpp': 'cpp',
-            'c': 'c'
-        }
-        return lang_map.get(lang.lower(), lang)
-
-    def check_document_format(self, doc_info):
-        """检查并修正文档格式"""
+        return self.CODE_LANGUAGES.get(lang.lower(), lang)
+
+    def check_document_format(self, doc):
+        """检查并修正文档格式
+
+        检查的是完整文章（Front Matter 头部 + 正文）。修正后的完整文章
+        作为新的正文保存，Front Matter 头部随之清空，发布时不会重复写入。
+        """
         try:
-            content = doc_info.get('optimized_content', doc_info.get('content', ''))
+            content = (doc.front_matter or '') + (doc.content or '')
 
             if not content:
-                self.logger.warning(f"文档内容为空: {doc_info.get('filename', 'unknown')}")
-                return doc_info
+                self.logger.warning(f"文档内容为空: {doc.filename or 'unknown'}")
+                return doc
 
             # 记录原始内容
             original_content = content
@@ -314,52 +290,42 @@ reading_time: 1 分钟
             changes_made = content != original_content
 
             # 更新文档信息
-            doc_info.update({
-                'format_checked_content': content,
-                'format_changes_made': changes_made,
-                'format_check_time': datetime.now().isoformat(),
-                'status': 'format_checked'
-            })
+            doc.format_changes_made = changes_made
+            doc.format_check_time = datetime.now().isoformat()
 
             # 保存格式检查后的内容
-            doc_info['optimized_content'] = content
+            doc.front_matter = ''
+            doc.update_content(content, 'format_checked')
+            doc.complete_stage('format_checked')
 
-            self.logger.info(f"格式检查完成: {doc_info.get('filename', 'unknown')} {'(已修正)' if changes_made else '(无需修正)'}")
-            return doc_info
-
-        except Exception as e:
-            self.logger.error(f"格式检查失败 {doc_info.get('filename', 'unknown')}: {e}")
-            doc_info['status'] = 'format_check_failed'
-            doc_info['error'] = str(e)
-            return doc_info
-
-    def process_batch(self, batch_file):
-        """处理一批文档"""
-        self.logger.info(f"开始格式检查批次: {batch_file}")
+            self.logger.info(f"格式检查完成: {doc.filename or 'unknown'} {'(已修正)' if changes_made else '(无需修正)'}")
+            return doc
 
-        # 加载批次文件
-        try:
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
         except Exception as e:
-            self.logger.error(f"加载批次文件失败: {e}")
-            return None
+            self.logger.error(f"格式检查失败 {doc.filename or 'unknown'}: {e}")
+            doc.fail('format_check_failed', e)
+            return doc
 
-        # 处理每个文档
+    def process_documents(self, documents):
+        """格式检查一组文档（在内存中处理，不读写批次文件）"""
         format_checked_docs = []
         for doc in documents:
             # 检查文档状态：enhanced, reviewed, 或 privacy_checked 都需要格式检查
-            if doc.get('status') in ['enhanced', 'reviewed', 'privacy_checked']:
+            if doc.status in ['enhanced', 'reviewed', 'privacy_checked']:
                 checked_doc = self.check_document_format(doc)
                 format_checked_docs.append(checked_doc)
             else:
                 format_checked_docs.append(doc)
+        return format_checked_docs
+
+    def process_batch(self, batch_file):
+        """处理一批文档"""
+        self.logger.info(f"开始格式检查批次: {batch_file}")
 
-        # 保存格式检查后的批次
-        format_checked_batch_file = batch_file.replace('_privacy_checked.json', '_format_checked.json').replace('_reviewed.json', '_format_checked.json')
+        # 逐个文档处理并写入格式检查后的批次
+        format_checked_batch_file = stage_batch_file(batch_file, 'format_checked')
         try:
-            with open(format_checked_batch_file, 'w', encoding='utf-8') as f:
-                json.dump(format_checked_docs, f, ensure_ascii=False, indent=2)
+            transform_batch(batch_file, format_checked_batch_file, self.process_documents)
 
             self.logger.info(f"格式检查完成，已保存到: {format_checked_batch_file}")
             return format_checked_batch_file
@@ -386,7 +352,7 @@ if __name__ == "__main__":
 
     # 查找需要格式检查的批次文件
     import glob
-    batch_files = glob.glob('batch_*_reviewed.json') + glob.glob('batch_*_privacy_checked.json')
+    batch_files = glob.glob('batch_*_reviewed.jsonl') + glob.glob('batch_*_privacy_checked.jsonl')
 
     if batch_files:
         checked = checker.run(batch_files)
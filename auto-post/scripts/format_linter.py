@@ -0,0 +1,171 @@
+"""文档格式检查规则"""
+import re
+from collections import namedtuple
+
+from markdown_model import parse_markdown, TEXT, CODE, FENCE_OPEN, FENCE_CLOSE, FRONT_MATTER
+
+# 格式问题：规则名、行号和列号（从 1 开始）、说明
+Diagnostic = namedtuple('Diagnostic', ['rule', 'line', 'column', 'message'])
+
+# 已注册的规则，键为规则名
+RULES = {}
+
+def register(rule_cls):
+    """注册一条格式规则（用作类装饰器）"""
+    RULES[rule_cls.name] = rule_cls
+    return rule_cls
+
+class Rule:
+    """格式规则基类
+
+    kinds 为规则关心的行类型（None 表示所有行）。检查时 start() 先收到
+    整篇文档的结构模型，然后 check_line() 按顺序收到这些类型的每一行，
+    最后调用 finish()。发现问题时调用 report()。
+    """
+
+    name = None
+    kinds = None
+
+    def start(self, model, diagnostics):
+        self.model = model
+        self.diagnostics = diagnostics
+
+    def check_line(self, index, line, kind):
+        pass
+
+    def finish(self):
+        pass
+
+    def report(self, index, column, message):
+        """记录一个问题（index 为从 0 开始的行号，column 从 1 开始）"""
+        self.diagnostics.append(Diagnostic(self.name, index + 1, column, message))
+
+@register
+class FrontMatterRule(Rule):
+    """Front Matter 中混入表格或分隔线"""
+
+    name = 'front_matter'
+    kinds = (FRONT_MATTER,)
+
+    def check_line(self, index, line, kind):
+        if line.lstrip().startswith('|'):
+            self.report(index, line.index('|') + 1, "Front Matter 可能包含表格内容")
+        elif '------' in line:
+            self.report(index, line.index('------') + 1, "Front Matter 包含过多的横线")
+
+@register
+class ExcerptLengthRule(Rule):
+    """摘要过长"""
+
+    name = 'excerpt_length'
+    kinds = (FRONT_MATTER, TEXT)
+    max_length = 200
+
+    def check_line(self, index, line, kind):
+        if line.startswith('excerpt:'):
+            excerpt = line[8:].strip()
+            if len(excerpt) > self.max_length:
+                self.report(index, 9, f"摘要过长 ({len(excerpt)} 字符)")
+
+@register
+class DuplicateTitleRule(Rule):
+    """重复的一级标题（代码块中的 # 注释不算标题）"""
+
+    name = 'duplicate_title'
+    kinds = ()
+
+    def finish(self):
+        seen = set()
+        for heading in self.model.headings:
+            if heading.level == 1:
+                title = heading.title.strip()
+                if title in seen:
+                    self.report(heading.line, 1, f"重复的标题: {title}")
+                seen.add(title)
+
+@register
+class UnclosedCodeBlockRule(Rule):
+    """代码块没有结束标记"""
+
+    name = 'unclosed_code_block'
+    kinds = (FENCE_OPEN, FENCE_CLOSE)
+
+    def start(self, model, diagnostics):
+        super().start(model, diagnostics)
+        self.open_line = None
+
+    def check_line(self, index, line, kind):
+        self.open_line = index if kind == FENCE_OPEN else None
+
+    def finish(self):
+        if self.open_line is not None:
+            line = self.model.lines[self.open_line]
+            self.report(self.open_line, line.index('```') + 1, "代码块标记不匹配")
+
+@register
+class TableSeparatorRule(Rule):
+    """表格第二行不是分隔行"""
+
+    name = 'table_separator'
+    kinds = None
+
+    ROW = re.compile(r'\|.*\|$')
+    SEPARATOR = re.compile(r'\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$')
+
+    def start(self, model, diagnostics):
+        super().start(model, diagnostics)
+        self.header = None      # 等待分隔行的表头行
+        self.in_table = False
+
+    def check_line(self, index, line, kind):
+        is_row = kind == TEXT and self.ROW.match(line) is not None
+        if self.header is not None:
+            # 表头的下一行：分隔行可以不以 | 开头
+            is_separator = kind == TEXT and self.SEPARATOR.match(line) is not None
+            if not is_separator:
+                self.report(self.header, 1, "表格缺少分隔行")
+            self.header = None
+            self.in_table = is_row or is_separator
+            return
+
+        if is_row and not self.in_table:
+            self.header = index
+        self.in_table = is_row
+
+    def finish(self):
+        if self.header is not None:
+            self.report(self.header, 1, "表格缺少分隔行")
+
+class FormatLinter:
+    """按规则检查文档格式
+
+    所有规则共用一次解析得到的 Markdown 结构模型，逐行遍历一次，每一行
+    只分派给关心该行类型的规则。rules 为要启用的规则名，默认全部启用。
+    """
+
+    def __init__(self, rules=None):
+        names = list(RULES) if rules is None else rules
+        unknown = [name for name in names if name not in RULES]
+        if unknown:
+            raise ValueError(f"未知的格式规则: {', '.join(unknown)}")
+        self.rule_names = names
+
+    def lint(self, content, model=None):
+        """返回按行、列排序的 Diagnostic 列表（model 为 content 的结构模型，可选）"""
+        model = parse_markdown(content, model)
+        diagnostics = []
+        rules = [RULES[name]() for name in self.rule_names]
+        dispatch = {kind: [] for kind in (TEXT, CODE, FENCE_OPEN, FENCE_CLOSE, FRONT_MATTER)}
+        for rule in rules:
+            rule.start(model, diagnostics)
+            for kind in (dispatch if rule.kinds is None else rule.kinds):
+                dispatch[kind].append(rule.check_line)
+
+        for index, (line, kind) in enumerate(zip(model.lines, model.kinds)):
+            for check_line in dispatch[kind]:
+                check_line(index, line, kind)
+
+        for rule in rules:
+            rule.finish()
+        diagnostics.sort(key=lambda d: (d.line, d.column))
+        return diagnostics
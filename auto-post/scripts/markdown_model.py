@@ -0,0 +1,217 @@
+"""Markdown 块级结构模型"""
+import re
+from collections import namedtuple
+
+# 行类型
+TEXT = 'text'
+CODE = 'code'
+FENCE_OPEN = 'fence_open'
+FENCE_CLOSE = 'fence_close'
+FRONT_MATTER = 'front_matter'
+
+# 行首的 ATX 标题
+_HEADING = re.compile(r'(#{1,6})\s+(.+)$')
+
+# 标题：行号（从 0 开始）、级别、标题文本
+Heading = namedtuple('Heading', ['line', 'level', 'title'])
+
+# 正文中需要原样保留的片段：行内代码、URL，以及文本中本来就有的占位符字符
+_INLINE_PROTECTED = re.compile(
+    r"``[^\n]+?``|`[^`\n]+`|https?://[A-Za-z0-9._~:/?#@!$&'*+,;=%-]+|[\ue000-\ue002]"
+)
+
+# 占位符：行内片段为 \ue000<序号>\ue001；非正文行为 \ue000<序号>\ue002，
+# 后面跟着的换行（如果变换没有删掉）一起还原
+_PLACEHOLDER = re.compile('\ue000(\\d+)(?:\ue001|\ue002\n?)')
+
+class MarkdownModel:
+    """一次扫描得到的 Markdown 块级结构
+
+    记录每一行的类型（正文、代码、代码块标记、Front Matter）、行首偏移、
+    标题和代码块语言。各阶段直接查询这些信息，不再各自逐行跟踪代码块。
+    代码块的判定与原来各阶段一致：去掉首尾空白后以 ``` 开头的行切换
+    代码块状态。
+    """
+
+    __slots__ = ('text', 'lines', 'line_starts', 'kinds', 'fence_info', 'headings', 'front_matter_end')
+
+    def __init__(self, text):
+        self.text = text
+        self.lines = text.split('\n')
+        self.line_starts = []
+        self.kinds = []
+        self.fence_info = {}
+        self.headings = []
+        self.front_matter_end = None
+
+        lines = self.lines
+        # 首行为 --- 且之后还有一行 --- 时视为 Front Matter
+        if lines[0] == '---':
+            for i in range(1, len(lines)):
+                if lines[i] == '---':
+                    self.front_matter_end = i
+                    break
+
+        pos = 0
+        in_code_block = False
+        for i, line in enumerate(lines):
+            self.line_starts.append(pos)
+            pos += len(line) + 1
+
+            if self.front_matter_end is not None and i <= self.front_matter_end:
+                self.kinds.append(FRONT_MATTER)
+                continue
+
+            stripped = line.strip()
+            if stripped.startswith('```'):
+                if in_code_block:
+                    self.kinds.append(FENCE_CLOSE)
+                else:
+                    self.kinds.append(FENCE_OPEN)
+                    self.fence_info[i] = stripped[3:].strip()
+                in_code_block = not in_code_block
+            elif in_code_block:
+                self.kinds.append(CODE)
+            else:
+                self.kinds.append(TEXT)
+                if line.startswith('#'):
+                    match = _HEADING.match(line)
+                    if match:
+                        self.headings.append(Heading(i, len(match.group(1)), match.group(2)))
+
+    def is_fence(self, index):
+        """该行是否是代码块标记"""
+        return self.kinds[index] in (FENCE_OPEN, FENCE_CLOSE)
+
+    def prose_spans(self):
+        """连续正文行的字符区间 [(起点, 终点)]，不含代码块和 Front Matter"""
+        spans = []
+        start = None
+        for i, kind in enumerate(self.kinds):
+            if kind == TEXT:
+                if start is None:
+                    start = self.line_starts[i]
+                end = self.line_starts[i] + len(self.lines[i])
+            elif start is not None:
+                spans.append((start, end))
+                start = None
+        if start is not None:
+            spans.append((start, end))
+        return spans
+
+def parse_markdown(text, model=None):
+    """返回 text 的结构模型；传入的 model 与 text 一致时直接复用"""
+    if model is not None and model.text == text:
+        return model
+    return MarkdownModel(text)
+
+def rewrite_prose(text, transform, model=None):
+    """只对正文应用文本变换，返回 (新文本, transform 的附加结果)
+
+    代码块、Front Matter 等非正文行，以及正文中的行内代码和 URL 先替换成
+    占位符，transform 在得到的整篇文本上执行一次，最后一次性把占位符还原。
+    transform 接收文本，返回 (新文本, 附加结果)。
+
+    非正文行连同两侧的换行一起替换，transform 中跨行的正则（例如
+    \\*\\s*...）无法删掉这些换行，把代码块标记接到正文行上。占位符后面
+    再放一个换行，下一段正文仍然从行首开始。
+    """
+    model = parse_markdown(text, model)
+    protected = []
+
+    def protect(segment, end='\ue001'):
+        protected.append(segment)
+        return f'\ue000{len(protected) - 1}{end}'
+
+    parts = []
+    pos = 0
+    for start, end in model.prose_spans():
+        if start > pos:
+            parts.append(protect(text[pos:start], '\ue002'))
+            parts.append('\n')
+        parts.append(_INLINE_PROTECTED.sub(lambda m: protect(m.group()), text[start:end]))
+        pos = end
+    if pos < len(text):
+        parts.append(protect(text[pos:], '\ue002'))
+
+    view, result = transform(''.join(parts))
+    return _PLACEHOLDER.sub(lambda m: protected[int(m.group(1))], view), result
+
+# 行首结构：标题标记、有序列表序号、无序列表标记之后缺少空格
+_LINE_STRUCTURE = r'(?:(?P<heading>{heading})[^\s#]|\s*(?:(?P<number>\d+)[^\s.]|(?P<bullet>[-*+])\S))'
+
+# 代码块标记后的语言标识（行内任意位置）
+_CODE_LANGUAGE = re.compile(r'```(\w*)')
+
+class LineNormalizer:
+    """逐行修正 Markdown 格式，一次遍历完成所有行级规则
+
+    各规则与原来对整篇文本的逐条正则替换结果一致：
+
+    - 标题标记后补空格（indented_headings 为 True 时允许行首缩进）
+    - 有序列表序号后补 ". "，无序列表标记后补空格
+    - code_language 不为 None 时用它改写 ``` 后的语言标识
+    - table_spacing 为 True 时在表格（连续的含 | 的行）结束后插入空行
+    - squash_blank_lines 为 True 时把三个及以上连续换行压缩为两个
+
+    同一行最多只有一条行首规则适用，规则之间互不影响。
+    """
+
+    def __init__(self, indented_headings=False, code_language=None, table_spacing=False, squash_blank_lines=False):
+        heading = r'\s*#{1,6}' if indented_headings else r'#{1,6}'
+        self.structure = re.compile(_LINE_STRUCTURE.format(heading=heading))
+        self.code_language = code_language
+        self.table_spacing = table_spacing
+        self.squash_blank_lines = squash_blank_lines
+
+    def _replace_language(self, match):
+        return '```' + self.code_language(match.group(1))
+
+    def normalize(self, text):
+        """返回修正后的文本"""
+        output = []
+        blank_lines = 0  # 尚未输出的连续空行（压缩空行时）
+        in_table = False
+
+        for line in text.split('\n'):
+            match = self.structure.match(line)
+            if match:
+                if match.group('heading') is not None:
+                    pos, insert = match.end('heading'), ' '
+                elif match.group('number') is not None:
+                    pos, insert = match.end('number'), '. '
+                else:
+                    pos, insert = match.end('bullet'), ' '
+                line = line[:pos] + insert + line[pos:]
+
+            if self.table_spacing:
+                if '|' in line and not line.strip().startswith('```'):
+                    in_table = True
+                elif in_table:
+                    # 表格结束，添加空行
+                    in_table = False
+                    if self.squash_blank_lines:
+                        blank_lines += 1
+                    else:
+                        output.append('')
+
+            if self.code_language is not None and '```' in line:
+                line = _CODE_LANGUAGE.sub(self._replace_language, line)
+
+            if not self.squash_blank_lines:
+                output.append(line)
+            elif not line:
+                blank_lines += 1
+            else:
+                # 两行之间的换行数为空行数加一，最多保留两个换行；开头的空行数即换行数
+                output.extend([''] * (min(blank_lines, 1) if output else min(blank_lines, 2)))
+                output.append(line)
+                blank_lines = 0
+
+        if self.squash_blank_lines and blank_lines:
+            if output:
+                output.extend([''] * min(blank_lines, 2))
+            else:
+                # 全部是空行：换行数比行数少一
+                output = [''] * (min(blank_lines - 1, 2) + 1)
+        return '\n'.join(output)
@@ -1,6 +1,5 @@
 """标题和结构优化脚本"""
 import re
-import json
 from pathlib import Path
 import sys
 from datetime import datetime
@@ -10,11 +9,17 @@ import os
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger, load_config, save_config, sanitize_filename, extract_title_from_content, generate_slug
+from utils import setup_logger, load_config, save_config, sanitize_filename, extract_title_from_content, generate_slug, transform_batch, stage_batch_file
+from markdown_model import parse_markdown, CODE, FENCE_OPEN, FENCE_CLOSE
+from result_cache import fingerprint
 
 class DocumentOptimizer:
     """文档优化器"""
 
+    # 阶段缓存：处理的文档状态和处理逻辑版本（逻辑变化时递增，使缓存失效）
+    INPUT_STATUS = 'read'
+    STAGE_VERSION = 1
+
     def __init__(self, config_dir):
         self.logger = setup_logger('DocumentOptimizer', 'logs/optimizer.log')
         self.config_dir = Path(config_dir)
@@ -22,7 +27,9 @@ class DocumentOptimizer:
         # 加载关键词配置
         keywords_file = self.config_dir / 'keywords.json'
         self.keywords_config = load_config(keywords_file) if keywords_file.exists() else {}
-        self.tech_keywords = set(self.keywords_config.get('tech_keywords', []))
+        # 保留配置中的顺序，保证标签顺序在不同进程间一致
+        self.tech_keyword_list = list(dict.fromkeys(self.keywords_config.get('tech_keywords', [])))
+        self.tech_keywords = set(self.tech_keyword_list)
         self.stop_words = set(self.keywords_config.get('stop_words', []))
 
         self.logger.info("文档优化器初始化完成")
@@ -57,30 +64,25 @@ class DocumentOptimizer:
 
         return optimized_title
 
-    def optimize_document_structure(self, content):
-        """优化文档结构"""
-        lines = content.split('\n')
+    def optimize_document_structure(self, content, model=None):
+        """优化文档结构（model 为 content 的 Markdown 结构模型，可选）"""
+        model = parse_markdown(content, model)
         optimized_lines = []
-        in_code_block = False
-        code_block_lang = None
 
         # 处理每一行
-        for line in lines:
+        for i, (line, kind) in enumerate(zip(model.lines, model.kinds)):
             stripped = line.strip()
 
             # 处理代码块
-            if stripped.startswith('```'):
-                if not in_code_block:
-                    in_code_block = True
-                    code_block_lang = stripped[3:].strip() or 'text'
-                    optimized_lines.append(f"```{code_block_lang}")
-                else:
-                    in_code_block = False
-                    optimized_lines.append('```')
-                    code_block_lang = None
+            if kind == FENCE_OPEN:
+                code_block_lang = model.fence_info[i] or 'text'
+                optimized_lines.append(f"```{code_block_lang}")
+                continue
+            if kind == FENCE_CLOSE:
+                optimized_lines.append('```')
                 continue
 
-            if in_code_block:
+            if kind == CODE:
                 optimized_lines.append(line)
                 continue
 
@@ -188,7 +190,7 @@ class DocumentOptimizer:
         found_tags = []
 
         # 查找技术关键词
-        for keyword in self.tech_keywords:
+        for keyword in self.tech_keyword_list:
             if keyword.lower() in text and keyword not in found_tags:
                 found_tags.append(keyword)
                 if len(found_tags) >= max_tags:
@@ -218,17 +220,17 @@ class DocumentOptimizer:
 
         return found_tags[:max_tags]
 
-    def optimize_document(self, doc_info):
+    def optimize_document(self, doc):
         """优化单个文档"""
         try:
-            content = doc_info['content']
+            content = doc.content
 
             # 优化标题
             original_title = extract_title_from_content(content)
             optimized_title = self.optimize_title(original_title, content)
 
             # 优化文档结构
-            optimized_content = self.optimize_document_structure(content)
+            optimized_content = self.optimize_document_structure(content, doc.markdown)
 
             # 提取摘要
             summary = self.extract_summary(content)
@@ -240,52 +242,50 @@ class DocumentOptimizer:
             slug = generate_slug(optimized_title)
 
             # 更新文档信息
-            doc_info.update({
-                'original_title': original_title,
-                'optimized_title': optimized_title,
-                'slug': slug,
-                'summary': summary,
-                'tags': tags,
-                'optimized_content': optimized_content,
-                'optimization_time': datetime.now().isoformat(),
-                'status': 'optimized'
-            })
-
-            self.logger.info(f"文档优化完成: {doc_info['filename']} -> {optimized_title}")
-            return doc_info
+            doc.original_title = original_title
+            doc.optimized_title = optimized_title
+            doc.slug = slug
+            doc.summary = summary
+            doc.tags = tags
+            doc.optimization_time = datetime.now().isoformat()
+            doc.update_content(optimized_content, 'optimized')
+            doc.complete_stage('optimized')
+
+            self.logger.info(f"文档优化完成: {doc.filename} -> {optimized_title}")
+            return doc
 
         except Exception as e:
-            self.logger.error(f"优化文档失败 {doc_info.get('filename', 'unknown')}: {e}")
-            doc_info['status'] = 'optimization_failed'
-            doc_info['error'] = str(e)
-            return doc_info
+            self.logger.error(f"优化文档失败 {doc.filename or 'unknown'}: {e}")
+            doc.fail('optimization_failed', e)
+            return doc
 
-    def process_batch(self, batch_file):
-        """处理一批文档"""
-        self.logger.info(f"开始处理批次: {batch_file}")
+    def cache_fingerprint(self):
+        """影响阶段输出的配置指纹"""
+        return fingerprint(self.keywords_config)
 
-        # 加载批次文件
-        try:
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
-        except Exception as e:
-            self.logger.error(f"加载批次文件失败: {e}")
-            return None
+    def refresh_cached(self, doc):
+        """使用缓存的输出时重新生成时间戳"""
+        doc.optimization_time = datetime.now().isoformat()
 
-        # 处理每个文档
+    def process_documents(self, documents):
+        """优化一组文档（在内存中处理，不读写批次文件）"""
         processed_docs = []
         for doc in documents:
-            if doc.get('status') == 'read':
+            if doc.status == self.INPUT_STATUS:
                 processed_doc = self.optimize_document(doc)
                 processed_docs.append(processed_doc)
             else:
                 processed_docs.append(doc)
+        return processed_docs
+
+    def process_batch(self, batch_file):
+        """处理一批文档"""
+        self.logger.info(f"开始处理批次: {batch_file}")
 
-        # 保存优化后的批次
-        optimized_batch_file = batch_file.replace('.json', '_optimized.json')
+        # 逐个文档处理并写入优化后的批次
+        optimized_batch_file = stage_batch_file(batch_file, 'optimized')
         try:
-            with open(optimized_batch_file, 'w', encoding='utf-8') as f:
-                json.dump(processed_docs, f, ensure_ascii=False, indent=2)
+            transform_batch(batch_file, optimized_batch_file, self.process_documents)
 
             self.logger.info(f"批次优化完成，已保存到: {optimized_batch_file}")
             return optimized_batch_file
@@ -312,7 +312,7 @@ if __name__ == "__main__":
     optimizer = DocumentOptimizer('config')
 
     # 查找批次文件
-    batch_files = list(Path('.').glob('batch_*.json'))
+    batch_files = list(Path('.').glob('batch_*.jsonl'))
     if batch_files:
         optimized = optimizer.run([str(f) for f in batch_files])
         print(f"\n成功优化 {len(optimized)} 个批次")
@@ -0,0 +1,464 @@
+"""多模式正则匹配"""
+import re
+import time
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+class ScanTimeout(Exception):
+    """扫描超过时间预算（position 为停止时的位置）"""
+
+    def __init__(self, position):
+        super().__init__(f'扫描超时，停止于位置 {position}')
+        self.position = position
+
+# re 忽略大小写时与 ASCII 字母等价、但 casefold() 不会折叠成该字母的字符
+_CASEFOLD_EXTRA = {0x131: 'i'}
+
+def parse_pattern(pattern, flags=0):
+    """解析正则表达式，返回 sre_parse 的语法树"""
+    return sre_parse.parse(pattern, flags)
+
+def literal_prefix(tree):
+    """模式开头必须出现的字面量前缀（没有时返回空字符串）"""
+    chars = []
+    for op, av in tree:
+        if op != sre_parse.LITERAL:
+            break
+        chars.append(chr(av))
+    return ''.join(chars)
+
+def required_literals(tree):
+    """模式的任何匹配中都必须出现的字面量片段列表"""
+    literals = []
+    run = []
+    for op, av in tree:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            literals.append(''.join(run))
+            run = []
+        if op == sre_parse.SUBPATTERN:
+            literals.extend(required_literals(av[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            literals.extend(required_literals(av[2]))
+    if run:
+        literals.append(''.join(run))
+    return literals
+
+def literal_anchor(tree, ignore_case=False):
+    """选出最长的必需字面量作为锚点（没有时返回 None）"""
+    literals = required_literals(tree)
+    if not literals:
+        return None
+    anchor = max(literals, key=len)
+    return anchor.casefold() if ignore_case else anchor
+
+# Python 3.11 才有的语法节点
+_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+_POSSESSIVE_REPEAT = getattr(sre_parse, 'POSSESSIVE_REPEAT', None)
+
+_REPEATS = tuple(op for op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, _POSSESSIVE_REPEAT) if op is not None)
+
+_AT_CODES = {
+    sre_parse.AT_BEGINNING: '^', sre_parse.AT_BEGINNING_STRING: '\\A',
+    sre_parse.AT_END: '$', sre_parse.AT_END_STRING: '\\Z',
+    sre_parse.AT_BOUNDARY: '\\b', sre_parse.AT_NON_BOUNDARY: '\\B',
+}
+
+_CATEGORY_CODES = {
+    sre_parse.CATEGORY_DIGIT: '\\d', sre_parse.CATEGORY_NOT_DIGIT: '\\D',
+    sre_parse.CATEGORY_SPACE: '\\s', sre_parse.CATEGORY_NOT_SPACE: '\\S',
+    sre_parse.CATEGORY_WORD: '\\w', sre_parse.CATEGORY_NOT_WORD: '\\W',
+}
+
+_FLAG_LETTERS = (
+    (sre_parse.SRE_FLAG_IGNORECASE, 'i'), (sre_parse.SRE_FLAG_MULTILINE, 'm'),
+    (sre_parse.SRE_FLAG_DOTALL, 's'), (sre_parse.SRE_FLAG_ASCII, 'a'),
+)
+
+def _flag_letters(flags):
+    return ''.join(letter for flag, letter in _FLAG_LETTERS if flags & flag)
+
+def _class_char(code):
+    char = chr(code)
+    return '\\' + char if char in '\\]^-[' else re.escape(char) if char.isspace() else char
+
+def unparse(tree):
+    """把 sre_parse 的语法树写回正则表达式文本"""
+    parts = []
+    for op, av in tree:
+        if op == sre_parse.LITERAL:
+            parts.append(re.escape(chr(av)))
+        elif op == sre_parse.NOT_LITERAL:
+            parts.append('[^' + _class_char(av) + ']')
+        elif op == sre_parse.ANY:
+            parts.append('.')
+        elif op == sre_parse.IN:
+            items = []
+            negate = ''
+            for item_op, item_av in av:
+                if item_op == sre_parse.NEGATE:
+                    negate = '^'
+                elif item_op == sre_parse.LITERAL:
+                    items.append(_class_char(item_av))
+                elif item_op == sre_parse.RANGE:
+                    items.append(_class_char(item_av[0]) + '-' + _class_char(item_av[1]))
+                elif item_op == sre_parse.CATEGORY:
+                    items.append(_CATEGORY_CODES[item_av])
+                else:
+                    raise ValueError(f'无法还原的字符集: {item_op}')
+            parts.append('[' + negate + ''.join(items) + ']')
+        elif op == sre_parse.AT:
+            parts.append(_AT_CODES[av])
+        elif op == sre_parse.BRANCH:
+            parts.append('(?:' + '|'.join(unparse(branch) for branch in av[1]) + ')')
+        elif op == sre_parse.SUBPATTERN:
+            group, add_flags, del_flags, body = av
+            inner = unparse(body)
+            if add_flags or del_flags:
+                removed = _flag_letters(del_flags)
+                inner = f'(?{_flag_letters(add_flags)}{"-" + removed if removed else ""}:{inner})'
+            parts.append(('(' if group else '(?:') + inner + ')')
+        elif op in _REPEATS:
+            low, high, body = av
+            inner = unparse(body)
+            if len(body) != 1 or body[0][0] in _REPEATS or body[0][0] == sre_parse.BRANCH:
+                inner = '(?:' + inner + ')'
+            if high == sre_parse.MAXREPEAT:
+                quantifier = {0: '*', 1: '+'}.get(low, f'{{{low},}}')
+            elif (low, high) == (0, 1):
+                quantifier = '?'
+            elif low == high:
+                quantifier = f'{{{low}}}'
+            else:
+                quantifier = f'{{{low},{high}}}'
+            if op == sre_parse.MIN_REPEAT:
+                quantifier += '?'
+            elif op == _POSSESSIVE_REPEAT:
+                quantifier += '+'
+            parts.append(inner + quantifier)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            direction, body = av
+            prefix = ('(?=' if direction == 1 else '(?<=') if op == sre_parse.ASSERT else ('(?!' if direction == 1 else '(?<!')
+            parts.append(prefix + unparse(body) + ')')
+        elif op == sre_parse.GROUPREF:
+            parts.append(f'(?:\\{av})')
+        elif op == sre_parse.GROUPREF_EXISTS:
+            group, yes, no = av
+            parts.append(f'(?({group}){unparse(yes)}' + (f'|{unparse(no)}' if no else '') + ')')
+        elif op == _ATOMIC_GROUP:
+            parts.append('(?>' + unparse(av) + ')')
+        else:
+            raise ValueError(f'无法还原的语法节点: {op}')
+    return ''.join(parts)
+
+def _min_width(tree, items):
+    """一段语法节点至少匹配的字符数"""
+    return sre_parse.SubPattern(tree.state, list(items)).getwidth()[0]
+
+def _unbounded_repeats(tree):
+    """语法树中是否含有无上限的重复"""
+    for op, av in tree:
+        if op in _REPEATS:
+            if av[1] == sre_parse.MAXREPEAT or _unbounded_repeats(av[2]):
+                return True
+        elif op == sre_parse.SUBPATTERN and _unbounded_repeats(av[-1]):
+            return True
+        elif op == sre_parse.BRANCH and any(_unbounded_repeats(branch) for branch in av[1]):
+            return True
+    return False
+
+def _ambiguous_nesting(body):
+    """重复体中是否有无上限重复，且重复体其余部分可以不匹配任何字符
+
+    例如 (a+)+、(\\w+\\s*)*：同一段输入可以有指数多种拆分方式。
+    ([a-z]+\\.)+ 这样每次重复都必须匹配一个分隔符的不算。
+    """
+    while len(body) == 1 and body[0][0] == sre_parse.SUBPATTERN:
+        body = body[0][1][-1]
+    for i, (op, av) in enumerate(body):
+        if op in _REPEATS and av[1] == sre_parse.MAXREPEAT:
+            rest = body.data[:i] + body.data[i + 1:]
+            if _min_width(body, rest) == 0:
+                return True
+    return False
+
+def _harden(tree, limits, issues):
+    """原地改写语法树：无上限重复改为有上限
+
+    后面还有必需内容的无上限重复在不匹配的输入上会从每个起点扫描到很远再
+    回溯，整体变成平方级；加上上限后每个起点的工作量有界。模式末尾的无上限
+    重复同样加上上限，每个模式的匹配长度因此有界，扫描可以分窗口进行。
+    """
+    for i, (op, av) in enumerate(tree.data):
+        if op in _REPEATS:
+            low, high, body = av
+            if high == sre_parse.MAXREPEAT:
+                if _ambiguous_nesting(body):
+                    issues.append(('nested_quantifier', '无上限重复中嵌套无上限重复，可能指数级回溯'))
+                wildcard = len(body) == 1 and body[0][0] == sre_parse.ANY
+                high = limits['max_wildcard_span'] if wildcard else limits['max_repeat']
+                high = max(high, low)
+                issues.append((
+                    'unbounded_wildcard' if wildcard else 'unbounded_repeat',
+                    f'无上限重复已限制为最多 {high} 次'
+                ))
+                tree.data[i] = (op, (low, high, body))
+            _harden(body, limits, issues)
+        elif op == sre_parse.SUBPATTERN:
+            _harden(av[-1], limits, issues)
+        elif op == sre_parse.BRANCH:
+            for branch in av[1]:
+                _harden(branch, limits, issues)
+        elif op == _ATOMIC_GROUP:
+            _harden(av, limits, issues)
+
+def harden_pattern(pattern, flags=0, max_repeat=4096, max_wildcard_span=16384):
+    """分析正则表达式的回溯风险，返回 (改写后的模式, 问题列表)
+
+    - 无上限重复（例如 -----BEGIN.*?-----END、[a-z]+@、末尾的 [a-z]+）
+      改为有上限的重复，通配符最多 max_wildcard_span 个字符，其他最多
+      max_repeat 次。
+    - 无上限重复中嵌套无上限重复且没有必需的分隔字面量（例如 (a+)+）
+      可能指数级回溯，只报告为 nested_quantifier，由调用方决定是否停用。
+
+    没有需要改写的地方时原样返回模式文本。问题列表为 (类型, 说明)。
+    """
+    tree = parse_pattern(pattern, flags)
+    issues = []
+    _harden(tree, {'max_repeat': max_repeat, 'max_wildcard_span': max_wildcard_span}, issues)
+    if not any(kind != 'nested_quantifier' for kind, _ in issues):
+        return pattern, issues
+
+    # 模式内用 (?i) 等方式打开的全局标志需要保留
+    inline_flags = _flag_letters(tree.state.flags & ~flags)
+    return (f'(?{inline_flags})' if inline_flags else '') + unparse(tree), issues
+
+def _lookahead_width(tree):
+    """向前断言在当前位置之后最多查看的字符数"""
+    width = 0
+    for op, av in tree:
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            direction, body = av
+            if direction == 1:
+                width = max(width, body.getwidth()[1])
+            width = max(width, _lookahead_width(body))
+        elif op in _REPEATS:
+            width = max(width, _lookahead_width(av[2]))
+        elif op == sre_parse.SUBPATTERN:
+            width = max(width, _lookahead_width(av[-1]))
+        elif op == sre_parse.BRANCH:
+            width = max([width] + [_lookahead_width(branch) for branch in av[1]])
+        elif op == _ATOMIC_GROUP:
+            width = max(width, _lookahead_width(av))
+    return width
+
+def match_span(tree):
+    """判断一个起点能否匹配时最多需要查看的字符数（含向前断言和 \\b）
+
+    模式含无上限重复时结果不小于 sre_parse.MAXREPEAT。
+    """
+    return tree.getwidth()[1] + _lookahead_width(tree) + 1
+
+def _trie_regex(words):
+    """把一组字面量写成前缀树形式的正则（只需判断是否有某个字面量在此处出现）"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            if node.get('') is True:
+                break
+            node = node.setdefault(char, {})
+        else:
+            # 更长的字面量以它为前缀，匹配到它就足够了
+            node.clear()
+            node[''] = True
+
+    def render(node):
+        if node.get('') is True:
+            return ''
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return render(trie)
+
+def _check_deadline(deadline, position):
+    """超过截止时间时抛出 ScanTimeout"""
+    if deadline is not None and time.perf_counter() > deadline:
+        raise ScanTimeout(position)
+
+class _Scanner:
+    """一组模式编译后的扫描器（见 PatternSet）"""
+
+    # 分窗口扫描时每个窗口的起点数
+    WINDOW = 4096
+
+    def __init__(self, entries, flags):
+        self.flags = flags
+        prefixes = []
+        self._by_first_char = {}
+        self._prefixed = []
+        self._others = []
+
+        for order, key, pattern, tree in entries:
+            compiled = re.compile(pattern, flags)
+            prefix = literal_prefix(tree)
+            if prefix:
+                if flags & re.IGNORECASE:
+                    prefix = prefix.lower()
+                entry = (order, key, compiled)
+                prefixes.append(prefix)
+                self._prefixed.append(entry)
+                self._by_first_char.setdefault(prefix[0], []).append(entry)
+            else:
+                self._others.append((key, compiled, match_span(tree)))
+
+        # 没有前缀模式时使用一个永远不匹配的表达式
+        self._search = re.compile(_trie_regex(prefixes) if prefixes else '(?!)', flags)
+
+    def finditer(self, text, pos, endpos, deadline=None):
+        # 前缀模式：在每个前缀出现的位置尝试首字符相同的模式，各模式分别
+        # 记录自己上一个匹配的终点，结果与逐个模式调用 finditer 相同
+        search = self._search.search
+        next_start = {}
+        candidate = search(text, pos, endpos)
+        while candidate is not None:
+            start = candidate.start()
+            _check_deadline(deadline, start)
+            char = text[start]
+            if self.flags & re.IGNORECASE:
+                char = char.lower()
+            # 首字符经过大小写折叠后对不上时（少数 Unicode 字符）尝试全部前缀模式
+            for order, key, pattern in self._by_first_char.get(char, self._prefixed):
+                if next_start.get(order, pos) > start:
+                    continue
+                match = pattern.match(text, start, endpos)
+                if match and match.end() > start:
+                    next_start[order] = match.end()
+                    yield key, match
+            candidate = search(text, start + 1, endpos)
+
+        for key, pattern, span in self._others:
+            for match in self._window_finditer(pattern, span, text, pos, endpos, deadline):
+                yield key, match
+
+    def _window_finditer(self, pattern, span, text, pos, endpos, deadline):
+        """分窗口查找一个模式的全部匹配，结果与 pattern.finditer 相同
+
+        一次 search 无法中途打断，在不匹配的长文本上可能扫描很久。这里每次
+        只在 [start, start + WINDOW + span) 中查找，只接受起点在前 WINDOW 个
+        位置的匹配：从这些起点开始的任何尝试都不会看到窗口之外，结果与在
+        原文上查找相同。每个窗口前检查一次截止时间。span 为 match_span()，
+        无上限的模式整段查找。
+        """
+        start = pos
+        while start < endpos:
+            _check_deadline(deadline, start)
+            limit = start + self.WINDOW
+            window_end = limit + span
+            if window_end >= endpos:
+                limit = window_end = endpos
+            match = pattern.search(text, start, window_end)
+            if match is None or match.start() >= limit:
+                start = limit
+                continue
+            if match.end() > match.start():
+                yield match
+                start = match.end()
+            else:
+                start = match.start() + 1
+
+class PatternSet:
+    """一组正则表达式的扫描器，找出每个模式各自的全部匹配
+
+    结果与逐个模式调用 finditer 相同：同一模式的匹配互不重叠，不同模式的
+    匹配可以重叠（例如 config.sk-... 既是域名也含 API 密钥），由调用方按
+    需要取舍。为了让模式数量增加时扫描不随之变慢：
+
+    - 以字面量开头的模式（sk-、AKIA、ghp_、-----BEGIN 等）：前缀合并成
+      一个前缀树形式的正则，一次扫描找出所有前缀出现的位置，在这些位置
+      只尝试首字符相同的模式。
+    - 其他模式（邮箱、域名、IP 等）逐个分窗口扫描。
+
+    编译时还为每个模式找出一个必需的字面量作为锚点（例如 sk-、@、
+    mysql://），扫描前先用子串查找检查锚点，锚点不在文本中的模式直接
+    跳过，不参与正则匹配。各种模式子集的扫描器按需编译并缓存。
+    """
+    # 缓存的模式子集扫描器数量上限
+    MAX_CACHED_SCANNERS = 64
+
+    def __init__(self, flags=0):
+        self.flags = flags
+        self._entries = []
+        self._compiled = False
+
+    def add(self, key, pattern):
+        """加入一个模式，key 为匹配时返回的键"""
+        self._entries.append((key, pattern))
+        self._compiled = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def compile(self):
+        """解析模式并找出锚点（加入模式后第一次扫描时自动调用）"""
+        ignore_case = bool(self.flags & re.IGNORECASE)
+        self._parsed = []
+        self._anchors = []
+        for order, (key, pattern) in enumerate(self._entries):
+            tree = parse_pattern(pattern, self.flags)
+            self._parsed.append((order, key, pattern, tree))
+            self._anchors.append(literal_anchor(tree, ignore_case))
+        self._scanners = {}
+        self._compiled = True
+
+    def anchors(self):
+        """各模式的 (键, 锚点) 列表，没有锚点的模式始终参与扫描"""
+        if not self._compiled:
+            self.compile()
+        return [(entry[1], anchor) for entry, anchor in zip(self._parsed, self._anchors)]
+
+    def active_patterns(self, text):
+        """锚点出现在文本中的模式序号（没有锚点的模式总是包含在内）"""
+        if not self._compiled:
+            self.compile()
+        if self.flags & re.IGNORECASE:
+            text = text.casefold().translate(_CASEFOLD_EXTRA)
+        return frozenset(
+            order for order, anchor in enumerate(self._anchors)
+            if anchor is None or anchor in text
+        )
+
+    def _scanner(self, active):
+        """返回只包含 active 中模式的扫描器（按需编译并缓存）"""
+        scanner = self._scanners.get(active)
+        if scanner is None:
+            if len(self._scanners) >= self.MAX_CACHED_SCANNERS:
+                self._scanners.pop(next(iter(self._scanners)))
+            scanner = _Scanner([entry for entry in self._parsed if entry[0] in active], self.flags)
+            self._scanners[active] = scanner
+        return scanner
+
+    def finditer(self, text, pos=0, endpos=None, deadline=None):
+        """依次产生 (键, match)，先是前缀模式的匹配，然后是其他模式的匹配
+
+        deadline 为 time.perf_counter() 的截止时间，每个候选位置或扫描窗口
+        检查一次，超过时抛出 ScanTimeout。单次正则匹配无法中途打断，模式
+        应先经过 harden_pattern 限制重复次数：匹配长度有界时每个窗口的工作
+        量有界，无上限的模式只能整段扫描。
+        """
+        if not self._compiled:
+            self.compile()
+        if endpos is None:
+            endpos = len(text)
+
+        active = self.active_patterns(text[pos:endpos])
+        if not active:
+            return iter(())
+        return self._scanner(active).finditer(text, pos, endpos, deadline)
@@ -1,6 +1,11 @@
 """隐私内容检测脚本"""
+import base64
+import binascii
+import bisect
 import json
+import math
 import re
+import time
 from pathlib import Path
 import sys
 from datetime import datetime
@@ -10,11 +15,98 @@ import os
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger, load_config
+from utils import setup_logger, load_config, iter_batch, transform_batch, stage_batch_file
+from document import Document
+from markdown_model import parse_markdown, CODE
+from pattern_set import PatternSet, ScanTimeout, harden_pattern
+from result_cache import ResultCache, content_hash, fingerprint
+
+# 严重级别从高到低，重叠的匹配保留级别高的
+SEVERITY_ORDER = ('critical', 'high', 'medium', 'low')
+
+def resolve_overlaps(spans):
+    """从候选匹配中选出互不重叠的区间
+
+    spans 为 (起点, 终点, 严重级别, 数据) 列表。按严重级别从高到低、起点
+    从前到后、匹配从长到短依次选取，与已选区间重叠的丢弃。返回按起点排序
+    的 (起点, 终点, 数据) 列表。
+    """
+    rank = {severity: i for i, severity in enumerate(SEVERITY_ORDER)}
+    ordered = sorted(
+        enumerate(spans),
+        key=lambda item: (rank.get(item[1][2], len(SEVERITY_ORDER)), item[1][0], item[1][0] - item[1][1], item[0])
+    )
+
+    starts = []
+    selected = []
+    for _, (start, end, severity, data) in ordered:
+        i = bisect.bisect_right(starts, start)
+        # 与前一个区间（起点不大于 start）或后一个区间重叠
+        if i > 0 and selected[i - 1][1] > start:
+            continue
+        if i < len(starts) and starts[i] < end:
+            continue
+        starts.insert(i, start)
+        selected.insert(i, (start, end, data))
+    return selected
+
+def apply_replacements(content, replacements):
+    """一次性替换互不重叠的区间，replacements 为按起点排序的 (起点, 终点, 替换文本)"""
+    parts = []
+    pos = 0
+    for start, end, replacement in replacements:
+        parts.append(content[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(content[pos:])
+    return ''.join(parts)
+
+def build_domain_trie(domains):
+    """按标签倒序（com -> github）构建允许域名的前缀树，终点标记为 None 键"""
+    trie = {}
+    for domain in domains:
+        node = trie
+        for label in reversed(domain.lower().split('.')):
+            node = node.setdefault(label, {})
+        node[None] = True
+    return trie
 
 class PrivacyChecker:
     """隐私内容检测器"""
 
+    # 生成检测报告需要的文档字段
+    REPORT_FIELDS = ('filename', 'privacy_detections', 'severity_count', 'has_critical_issues', 'privacy_metrics')
+
+    # 链接，以及链接中视为敏感的参数
+    URL_PATTERN = r'https?://[^\s<>"{}|\\^`\[\]]+'
+    SENSITIVE_URL_PARAMS = ['api_key', 'apikey', 'key', 'token', 'secret', 'password', 'pwd']
+
+    # 可能是Base64的长字符串，以及解码后视为敏感的关键词
+    BASE64_PATTERN = r'[A-Za-z0-9+/]{40,}={0,2}'
+    SENSITIVE_BASE64_KEYWORDS = ['password', 'secret', 'key', 'token', 'private', 'api']
+
+    # 扫描的默认限制（可在 privacy.json 的 scan_limits 中覆盖）
+    DEFAULT_SCAN_LIMITS = {
+        'base64_min_length': 100,      # 只解码不短于此长度的字符串
+        'base64_min_entropy': 1.2,     # 字符类别熵低于此值的不解码（十六进制、长单词等）
+        'base64_decode_prefix': 4096,  # 只解码开头这么多字符
+        'base64_max_candidates': 50,   # 每个文档最多解码的候选数
+        'max_repeat': 4096,            # 后面还有内容的无上限重复（如 [a-z]+@）最多重复的次数
+        'max_wildcard_span': 16384,    # 后面还有内容的 .* / .*? 最多跨越的字符数
+        'scan_time_budget_seconds': 2.0,  # 每个文档的扫描时间预算，超时视为严重问题
+    }
+
+    # 检测逻辑变化时递增，使旧的缓存结果失效
+    CACHE_VERSION = 2
+
+    # 字符类别：大写、小写、数字、+/
+    BASE64_CLASSES = str.maketrans(
+        {**{chr(c): 'U' for c in range(ord('A'), ord('Z') + 1)},
+         **{chr(c): 'l' for c in range(ord('a'), ord('z') + 1)},
+         **{chr(c): 'd' for c in range(ord('0'), ord('9') + 1)},
+         '+': 's', '/': 's', '=': None}
+    )
+
     def __init__(self, config_dir):
         self.logger = setup_logger('PrivacyChecker', 'logs/privacy-checker.log')
         self.config_dir = Path(config_dir)
@@ -27,64 +119,269 @@ class PrivacyChecker:
         self.replacement_texts = self.privacy_config.get('replacement_texts', {})
         self.allowed_domains = set(self.privacy_config.get('allowed_domains', []))
         self.exclusion_patterns = self.privacy_config.get('exclusion_patterns', [])
+        self.scan_limits = dict(self.DEFAULT_SCAN_LIMITS, **self.privacy_config.get('scan_limits', {}))
+
+        # 允许域名按标签倒序建成前缀树，排除模式合并成一个正则
+        self.allowed_domain_trie = build_domain_trie(self.allowed_domains)
+        self.exclusion_matcher = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern in self.exclusion_patterns), re.IGNORECASE
+        ) if self.exclusion_patterns else None
+
+        # 检查模式的回溯风险，按严重级别排序
+        flags = re.IGNORECASE | re.DOTALL
+        categories = sorted(self.sensitive_patterns, key=lambda c: SEVERITY_ORDER.index(self._get_severity(c)))
+        safe_patterns = [
+            (category, pattern)
+            for category in categories
+            for pattern in self._load_patterns(category, self.sensitive_patterns[category], flags)
+        ]
+
+        # 各类别、链接和Base64检测放进同一个多模式扫描器，每个模式各自找出
+        # 全部匹配，重叠的匹配最后按严重级别取舍
+        self.scanner = PatternSet(flags)
+        for category, pattern in safe_patterns:
+            self.scanner.add(category, pattern)
+        self.scanner.add('sensitive_url', self.URL_PATTERN)
+        self.scanner.add('base64_secret', self.BASE64_PATTERN)
+        self.scanner.compile()
+
+        # 按匹配的键分派处理
+        self.handlers = {
+            'sensitive_url': self._handle_url,
+            'base64_secret': self._handle_base64,
+        }
+        self.url_param_patterns = {
+            param: re.compile(f'({param}=)[^&\\s]*', re.IGNORECASE) for param in self.SENSITIVE_URL_PARAMS
+        }
 
-        # 预编译正则表达式
-        self.compiled_patterns = {}
-        for category, patterns in self.sensitive_patterns.items():
-            self.compiled_patterns[category] = [re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in patterns]
+        # 检测结果缓存：键为正文哈希加规则指纹，规则改变后旧结果不再命中
+        cache_config = self.privacy_config.get('result_cache', {})
+        self.result_cache = None
+        if cache_config.get('enabled', False):
+            self.result_cache = ResultCache(
+                self.config_dir / cache_config.get('file', 'privacy_cache.db'),
+                max_bytes=cache_config.get('max_megabytes', 64) * 1024 * 1024
+            )
+        self.rules_fingerprint = fingerprint(
+            self.CACHE_VERSION, self.sensitive_patterns, sorted(self.allowed_domains), self.exclusion_patterns,
+            self.replacement_texts, self.scan_limits, self.URL_PATTERN, self.SENSITIVE_URL_PARAMS,
+            self.BASE64_PATTERN, self.SENSITIVE_BASE64_KEYWORDS
+        )
 
         self.logger.info("隐私内容检测器初始化完成")
 
+    def _load_patterns(self, category, patterns, flags):
+        """分析一个类别的模式，返回可以安全使用的模式（必要时改写）
+
+        后面还有必需内容的无上限重复会在不匹配的输入上退化成平方级扫描
+        （例如没有结尾的 -----BEGIN 让 .*? 从每个起点扫到文档末尾），改写
+        为有上限的重复；可能指数级回溯的嵌套重复无法安全改写，停用并警告。
+        """
+        safe = []
+        for pattern in patterns:
+            try:
+                hardened, issues = harden_pattern(
+                    pattern, flags,
+                    max_repeat=self.scan_limits['max_repeat'],
+                    max_wildcard_span=self.scan_limits['max_wildcard_span']
+                )
+            except (re.error, ValueError) as e:
+                self.logger.error(f"隐私规则无效，已停用 [{category}] {pattern}: {e}")
+                continue
+
+            if any(kind == 'nested_quantifier' for kind, _ in issues):
+                self.logger.warning(f"隐私规则可能指数级回溯，已停用 [{category}] {pattern}")
+                continue
+            if hardened != pattern:
+                self.logger.debug(f"隐私规则已限制重复次数 [{category}] {pattern} -> {hardened}")
+            safe.append(hardened)
+        return safe
+
     def is_allowed_domain(self, domain):
         """检查是否是允许的域名"""
         # 移除端口号
         domain = domain.split(':')[0].lower()
-        return domain in self.allowed_domains or any(domain.endswith('.' + d) for d in self.allowed_domains)
+        # 从顶级域名开始逐个标签查找，经过的任何一个允许域名（自身或上级域名）都算允许
+        node = self.allowed_domain_trie
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
 
     def is_excluded_pattern(self, text):
         """检查是否是排除的模式"""
-        for pattern in self.exclusion_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-        return False
+        return self.exclusion_matcher is not None and self.exclusion_matcher.search(text) is not None
 
     def mask_sensitive_content(self, content):
-        """屏蔽敏感内容"""
-        masked_content = content
-        detections = []
-
-        # 检查各种类型的敏感信息
-        for category, patterns in self.compiled_patterns.items():
-            for pattern in patterns:
-                matches = pattern.finditer(masked_content)
-
-                for match in matches:
-                    matched_text = match.group()
-                    start_pos = match.start()
-                    end_pos = match.end()
-                    context = masked_content[max(0, start_pos-30):start_pos] + matched_text + masked_content[end_pos:end_pos+30]
-
-                    # 特殊处理域名
-                    if category == 'domains':
-                        # 检查是否是允许的域名或排除的模式
-                        if self.is_allowed_domain(matched_text) or self.is_excluded_pattern(matched_text):
-                            continue
-
-                    # 记录检测结果
+        """屏蔽敏感内容，返回 (屏蔽后的文本, 检测结果)"""
+        masked_content, detections, _ = self.scan_content(content)
+        return masked_content, detections
+
+    def scan_content(self, content):
+        """扫描并屏蔽敏感内容，返回 (屏蔽后的文本, 检测结果, 扫描统计)
+
+        每个模式各自找出全部匹配（低级别模式的匹配不会挡住高级别模式），
+        按匹配的类别分派处理（敏感类别、链接参数、Base64），收集所有匹配
+        区间；重叠的匹配按严重级别保留一个，最后一次性拼出屏蔽后的文本。
+        位置都相对原文。
+        """
+        started = time.perf_counter()
+        budget = self.scan_limits['scan_time_budget_seconds']
+        scan = {
+            'spans': [],
+            'detections': [],
+            'deadline': started + budget if budget else None,
+            'metrics': {
+                'base64_candidates': 0,
+                'base64_low_entropy': 0,
+                'base64_decoded': 0,
+                'base64_skipped': 0,
+                'base64_seconds': 0.0,
+                'timed_out': False,
+            },
+        }
+        detections = scan['detections']
+        metrics = scan['metrics']
+
+        try:
+            for key, match in self.scanner.finditer(content, deadline=scan['deadline']):
+                handler = self.handlers.get(key, self._handle_category)
+                handler(key, match, content, scan)
+        except ScanTimeout as e:
+            # 超时后已找到的内容照常屏蔽，但文档视为有严重问题，不会被发布
+            metrics['timed_out'] = True
+            detections.append({
+                'type': 'scan_timeout',
+                'value': '',
+                'position': (e.position, e.position),
+                'context': content[max(0, e.position-30):e.position+30],
+                'severity': 'critical',
+                'message': f'隐私扫描超过 {budget} 秒未完成，位置 {e.position} 之后的内容未检测'
+            })
+            self.logger.error(f"隐私扫描超时（{budget} 秒），在位置 {e.position} 停止")
+
+        replacements = []
+        for start_pos, end_pos, (detection, replacement) in resolve_overlaps(scan['spans']):
+            if detection is not None:
+                detections.append(detection)
+            replacements.append((start_pos, end_pos, replacement))
+
+        detections.sort(key=lambda d: d['position'][0])
+        metrics['scan_seconds'] = time.perf_counter() - started
+        return apply_replacements(content, replacements), detections, metrics
+
+    def _handle_category(self, category, match, content, scan):
+        """处理 privacy.json 中敏感类别的匹配"""
+        matched_text = match.group()
+        start_pos, end_pos = match.span()
+
+        # 特殊处理域名
+        if category == 'domains':
+            # 检查是否是允许的域名或排除的模式
+            if self.is_allowed_domain(matched_text) or self.is_excluded_pattern(matched_text):
+                return
+
+        severity = self._get_severity(category)
+        detection = {
+            'type': category,
+            'value': matched_text,
+            'position': (start_pos, end_pos),
+            'context': content[max(0, start_pos-30):end_pos+30],
+            'severity': severity
+        }
+        replacement = self.replacement_texts.get(category, f'[{category.upper()}_REMOVED]')
+        scan['spans'].append((start_pos, end_pos, severity, (detection, replacement)))
+
+    def _handle_url(self, key, match, content, scan):
+        """检查URL中的敏感参数"""
+        url = match.group()
+        start_pos, end_pos = match.span()
+
+        # 检查URL中是否包含敏感参数
+        lowered = url.lower()
+        for param in self.SENSITIVE_URL_PARAMS:
+            if f'{param}=' in lowered:
+                scan['detections'].append({
+                    'type': 'sensitive_url',
+                    'value': url,
+                    'position': (start_pos, end_pos),
+                    'context': content[max(0, start_pos-20):end_pos+20],
+                    'severity': 'high',
+                    'parameter': param
+                })
+
+                # 屏蔽URL中的参数值
+                for value in self.url_param_patterns[param].finditer(url):
+                    scan['spans'].append((start_pos + value.end(1), start_pos + value.end(), 'high', (None, '[REMOVED]')))
+                break
+
+    def base64_class_entropy(self, text):
+        """字符类别（大写、小写、数字、+/）分布的熵（比特）
+
+        随机数据或文本的 Base64 编码四类字符都会出现（约 1.4~1.6），十六进制
+        摘要、驼峰标识符等只有一两类字符（约 1.0 以下）。
+        """
+        classes = text.translate(self.BASE64_CLASSES)
+        total = len(classes)
+        if not total:
+            return 0.0
+        entropy = 0.0
+        for cls in 'Ulds':
+            count = classes.count(cls)
+            if count:
+                p = count / total
+                entropy -= p * math.log2(p)
+        return entropy
+
+    def _handle_base64(self, key, match, content, scan):
+        """检查可能的Base64编码内容
+
+        候选先按字符类别熵筛选，只解码开头 base64_decode_prefix 个字符，
+        每个文档最多解码 base64_max_candidates 个候选，嵌入的大图片或压缩
+        代码不会拖慢检测。
+        """
+        limits = self.scan_limits
+        metrics = scan['metrics']
+        base64_str = match.group()
+        # 很长的Base64字符串可能是编码的密钥或证书
+        if len(base64_str) >= limits['base64_min_length']:
+            started = time.perf_counter()
+            metrics['base64_candidates'] += 1
+            # 解码长度取 4 的倍数，不完整的结尾不会导致解码失败
+            prefix = base64_str[:limits['base64_decode_prefix']]
+            prefix = prefix[:len(prefix) - len(prefix) % 4]
+
+            if metrics['base64_decoded'] >= limits['base64_max_candidates']:
+                metrics['base64_skipped'] += 1
+            elif self.base64_class_entropy(prefix) < limits['base64_min_entropy']:
+                metrics['base64_low_entropy'] += 1
+            else:
+                metrics['base64_decoded'] += 1
+                try:
+                    decoded_str = base64.b64decode(prefix).decode('utf-8', errors='ignore').lower()
+                except (binascii.Error, ValueError):
+                    # 解码失败，不是Base64
+                    decoded_str = ''
+
+                # 检查解码后是否包含敏感关键词
+                found = [kw for kw in self.SENSITIVE_BASE64_KEYWORDS if kw in decoded_str]
+                if found:
                     detection = {
-                        'type': category,
-                        'value': matched_text,
-                        'position': (start_pos, end_pos),
-                        'context': context,
-                        'severity': self._get_severity(category)
+                        'type': 'base64_secret',
+                        'value': base64_str[:50] + '...',
+                        'position': (match.start(), match.end()),
+                        'context': content[max(0, match.start()-20):match.end()+20],
+                        'severity': 'high',
+                        'decoded_contains': found
                     }
-                    detections.append(detection)
+                    scan['spans'].append((match.start(), match.end(), 'high', (detection, '[BASE64_SECRET_REMOVED]')))
+                    metrics['base64_seconds'] += time.perf_counter() - started
+                    return
 
-                    # 替换敏感内容
-                    replacement = self.replacement_texts.get(category, f'[{category.upper()}_REMOVED]')
-                    masked_content = masked_content[:start_pos] + replacement + masked_content[end_pos:]
-
-        return masked_content, detections
+            metrics['base64_seconds'] += time.perf_counter() - started
 
     def _get_severity(self, category):
         """获取严重级别"""
@@ -102,130 +399,76 @@ class PrivacyChecker:
         }
         return severity_map.get(category, 'medium')
 
-    def check_code_blocks(self, content):
-        """检查代码块中的敏感信息"""
-        lines = content.split('\n')
-        checked_lines = []
-        in_code_block = False
-        detections = []
-
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-
-            # 检查代码块标记
-            if stripped.startswith('```'):
-                in_code_block = not in_code_block
-                checked_lines.append(line)
-                continue
-
-            if in_code_block:
-                # 在代码块中查找敏感信息
-                masked_line, line_detections = self.mask_sensitive_content(line)
-                checked_lines.append(masked_line)
-
-                # 添加行号信息
-                for detection in line_detections:
-                    detection['line_number'] = i + 1
-                    detection['in_code_block'] = True
-                    detections.append(detection)
-            else:
-                checked_lines.append(line)
+    def locate_detections(self, detections, content, model=None):
+        """根据行首偏移为检测结果补充行号和是否位于代码块中（model 为 content 的 Markdown 结构模型，可选）"""
+        model = parse_markdown(content, model)
+        line_starts = model.line_starts
+        for detection in detections:
+            line = bisect.bisect_right(line_starts, detection['position'][0]) - 1
+            detection['line_number'] = line + 1
+            detection['in_code_block'] = model.kinds[line] == CODE
+        return detections
+
+    def _cache_key(self, content):
+        """缓存键：正文哈希加规则指纹"""
+        return f'{content_hash(content)}:{self.rules_fingerprint}'
+
+    def _load_cached_result(self, content):
+        """从缓存读取 (屏蔽后的内容, 检测结果, 指标)，未启用或未命中时返回 None"""
+        if self.result_cache is None:
+            return None
 
-        return '\n'.join(checked_lines), detections
+        started = time.perf_counter()
+        try:
+            cached = self.result_cache.get(self._cache_key(content))
+        except Exception as e:
+            self.logger.warning(f"读取隐私检测缓存失败: {e}")
+            return None
+        if cached is None:
+            return None
 
-    def check_urls_and_links(self, content):
-        """检查URL和链接中的敏感信息"""
-        detections = []
+        detections = cached['detections']
+        for detection in detections:
+            detection['position'] = tuple(detection['position'])
+        metrics = {'cache_hit': True, 'scan_seconds': time.perf_counter() - started}
+        return cached['masked_content'], detections, metrics
 
-        # 查找所有链接
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        matches = re.finditer(url_pattern, content)
+    def _store_cached_result(self, content, masked_content, detections, metrics):
+        """保存检测结果；扫描超时的结果不完整，不缓存"""
+        if self.result_cache is None:
+            return
+        metrics['cache_hit'] = False
+        if metrics.get('timed_out'):
+            return
 
-        for match in matches:
-            url = match.group()
-            start_pos = match.start()
-            end_pos = match.end()
+        try:
+            self.result_cache.put(self._cache_key(content), {
+                'masked_content': masked_content,
+                'detections': detections
+            })
+        except Exception as e:
+            self.logger.warning(f"写入隐私检测缓存失败: {e}")
 
-            # 检查URL中是否包含敏感参数
-            sensitive_params = ['api_key', 'apikey', 'key', 'token', 'secret', 'password', 'pwd']
-            for param in sensitive_params:
-                if f'{param}=' in url.lower():
-                    detection = {
-                        'type': 'sensitive_url',
-                        'value': url,
-                        'position': (start_pos, end_pos),
-                        'context': content[max(0, start_pos-20):end_pos+20],
-                        'severity': 'high',
-                        'parameter': param
-                    }
-                    detections.append(detection)
-
-                    # 屏蔽URL中的参数值
-                    masked_url = re.sub(f'({param}=)[^&\\s]*', r'\1[REMOVED]', url, flags=re.IGNORECASE)
-                    content = content[:start_pos] + masked_url + content[end_pos:]
-                    break
-
-        return content, detections
-
-    def check_base64_content(self, content):
-        """检查可能的Base64编码内容"""
-        # 查找可能是Base64的长字符串
-        base64_pattern = r'[A-Za-z0-9+/]{40,}={0,2}'
-        matches = re.finditer(base64_pattern, content)
-
-        detections = []
-        for match in matches:
-            base64_str = match.group()
-            # 检查是否可能是敏感信息的Base64编码
-            if len(base64_str) > 100:  # 很长的Base64字符串可能是编码的密钥或证书
-                try:
-                    import base64
-                    decoded = base64.b64decode(base64_str)
-                    decoded_str = decoded.decode('utf-8', errors='ignore')
-
-                    # 检查解码后是否包含敏感关键词
-                    sensitive_keywords = ['password', 'secret', 'key', 'token', 'private', 'api']
-                    if any(keyword in decoded_str.lower() for keyword in sensitive_keywords):
-                        detection = {
-                            'type': 'base64_secret',
-                            'value': base64_str[:50] + '...',
-                            'position': (match.start(), match.end()),
-                            'context': content[max(0, match.start()-20):match.end()+20],
-                            'severity': 'high',
-                            'decoded_contains': [kw for kw in sensitive_keywords if kw in decoded_str.lower()]
-                        }
-                        detections.append(detection)
-
-                        # 替换Base64内容
-                        content = content[:match.start()] + '[BASE64_SECRET_REMOVED]' + content[match.end():]
-
-                except:
-                    # 如果解码失败，可能不是Base64，跳过
-                    pass
-
-        return content, detections
-
-    def check_privacy(self, doc_info):
+    def check_privacy(self, doc):
         """检查文档的隐私内容"""
         try:
-            content = doc_info['optimized_content']
+            content = doc.content
             all_detections = []
 
-            # 1. 基本敏感内容检测
-            content, basic_detections = self.mask_sensitive_content(content)
-            all_detections.extend(basic_detections)
-
-            # 2. 检查代码块
-            content, code_detections = self.check_code_blocks(content)
-            all_detections.extend(code_detections)
-
-            # 3. 检查URL和链接
-            content, url_detections = self.check_urls_and_links(content)
-            all_detections.extend(url_detections)
+            # 正文和规则都没变时直接使用缓存的结果
+            cached = self._load_cached_result(content)
+            if cached is not None:
+                masked_content, basic_detections, metrics = cached
+                all_detections.extend(basic_detections)
+            else:
+                # 1. 敏感内容、URL参数和Base64内容检测（整篇文档扫描一次）
+                masked_content, basic_detections, metrics = self.scan_content(content)
+                all_detections.extend(basic_detections)
 
-            # 4. 检查Base64内容
-            content, base64_detections = self.check_base64_content(content)
-            all_detections.extend(base64_detections)
+                # 2. 标注检测结果所在的行和是否位于代码块中（位置相对屏蔽前的正文）
+                self.locate_detections(all_detections, content, doc.markdown)
+                self._store_cached_result(content, masked_content, all_detections, metrics)
+            content = masked_content
 
             # 统计检测结果
             severity_count = {
@@ -239,57 +482,50 @@ class PrivacyChecker:
             has_critical_issues = severity_count['critical'] > 0
 
             # 更新文档信息
-            doc_info.update({
-                'privacy_checked_content': content,
-                'privacy_detections': all_detections,
-                'severity_count': severity_count,
-                'has_critical_issues': has_critical_issues,
-                'privacy_check_time': datetime.now().isoformat(),
-                'status': 'privacy_checked'
-            })
+            doc.privacy_detections = all_detections
+            doc.severity_count = severity_count
+            doc.has_critical_issues = has_critical_issues
+            doc.privacy_metrics = metrics
+            doc.privacy_check_time = datetime.now().isoformat()
 
-            # 保存检测后的内容到 optimized_content
-            doc_info['optimized_content'] = content
+            # 用屏蔽后的内容替换正文
+            doc.update_content(content, 'privacy_checked')
+            doc.complete_stage('privacy_checked')
 
-            self.logger.info(f"隐私内容检测完成: {doc_info['filename']} (检测到: {len(all_detections)} 项, 严重: {severity_count['critical']})")
-            return doc_info
+            self.logger.info(f"隐私内容检测完成: {doc.filename} (检测到: {len(all_detections)} 项, 严重: {severity_count['critical']})")
+            return doc
 
         except Exception as e:
-            self.logger.error(f"隐私内容检测失败 {doc_info.get('filename', 'unknown')}: {e}")
-            doc_info['status'] = 'privacy_check_failed'
-            doc_info['error'] = str(e)
-            return doc_info
+            self.logger.error(f"隐私内容检测失败 {doc.filename or 'unknown'}: {e}")
+            doc.fail('privacy_check_failed', e)
+            return doc
 
-    def process_batch(self, batch_file):
-        """处理一批文档"""
-        self.logger.info(f"开始隐私检测批次: {batch_file}")
-
-        # 加载批次文件
-        try:
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
-        except Exception as e:
-            self.logger.error(f"加载批次文件失败: {e}")
-            return None
-
-        # 处理每个文档
+    def process_documents(self, documents):
+        """检测一组文档（在内存中处理，不读写批次文件）"""
         checked_docs = []
         for doc in documents:
-            if doc.get('status') == 'reviewed':
+            if doc.status == 'reviewed':
                 checked_doc = self.check_privacy(doc)
                 checked_docs.append(checked_doc)
             else:
                 checked_docs.append(doc)
+        return checked_docs
 
-        # 保存检测后的批次
-        checked_batch_file = batch_file.replace('_reviewed.json', '_privacy_checked.json')
+    def process_batch(self, batch_file):
+        """处理一批文档"""
+        self.logger.info(f"开始隐私检测批次: {batch_file}")
+
+        # 逐个文档处理并写入检测后的批次
+        checked_batch_file = stage_batch_file(batch_file, 'privacy_checked')
         try:
-            with open(checked_batch_file, 'w', encoding='utf-8') as f:
-                json.dump(checked_docs, f, ensure_ascii=False, indent=2)
+            transform_batch(batch_file, checked_batch_file, self.process_documents)
 
-            # 生成隐私检测报告
-            report_file = batch_file.replace('_reviewed.json', '_privacy_report.json')
-            self._generate_report(checked_docs, report_file)
+            # 生成隐私检测报告（只读取报告需要的字段）
+            checked_docs = [
+                Document.from_dict(data)
+                for data in iter_batch(checked_batch_file, fields=self.REPORT_FIELDS)
+            ]
+            self.write_report(checked_docs, batch_file)
 
             self.logger.info(f"隐私检测完成，已保存到: {checked_batch_file}")
             return checked_batch_file
@@ -298,6 +534,12 @@ class PrivacyChecker:
             self.logger.error(f"保存隐私检测批次失败: {e}")
             return None
 
+    def write_report(self, documents, batch_file):
+        """为一个批次生成隐私检测报告"""
+        report_file = stage_batch_file(batch_file, 'privacy_report', ext='.json')
+        self._generate_report(documents, report_file)
+        return report_file
+
     def _generate_report(self, documents, report_file):
         """生成隐私检测报告"""
         report = {
@@ -311,34 +553,65 @@ class PrivacyChecker:
                 'medium': 0,
                 'low': 0
             },
+            'scan_timeouts': 0,
+            'cache': {
+                'hits': 0,
+                'misses': 0
+            },
+            'base64_scan': {
+                'candidates': 0,
+                'low_entropy': 0,
+                'decoded': 0,
+                'skipped': 0,
+                'seconds': 0.0,
+                'candidates_per_second': None
+            },
             'documents': []
         }
 
         for doc in documents:
-            if 'privacy_detections' in doc:
+            if doc.privacy_detections is not None:
                 doc_report = {
-                    'filename': doc.get('filename', 'unknown'),
-                    'has_critical_issues': doc.get('has_critical_issues', False),
-                    'detection_count': len(doc['privacy_detections']),
-                    'severity_count': doc.get('severity_count', {}),
-                    'detections': doc['privacy_detections']
+                    'filename': doc.filename or 'unknown',
+                    'has_critical_issues': bool(doc.has_critical_issues),
+                    'detection_count': len(doc.privacy_detections),
+                    'severity_count': doc.severity_count or {},
+                    'detections': doc.privacy_detections
                 }
                 report['documents'].append(doc_report)
 
-                if doc['privacy_detections']:
+                # 汇总Base64检测的工作量
+                metrics = doc.privacy_metrics or {}
+                if metrics.get('timed_out'):
+                    report['scan_timeouts'] += 1
+                if 'cache_hit' in metrics:
+                    report['cache']['hits' if metrics['cache_hit'] else 'misses'] += 1
+                base64_scan = report['base64_scan']
+                for name in ('candidates', 'low_entropy', 'decoded', 'skipped', 'seconds'):
+                    base64_scan[name] += metrics.get(f'base64_{name}', 0)
+
+                if doc.privacy_detections:
                     report['documents_with_issues'] += 1
-                    report['total_detections'] += len(doc['privacy_detections'])
+                    report['total_detections'] += len(doc.privacy_detections)
 
                     # 更新严重性统计
-                    for severity, count in doc.get('severity_count', {}).items():
+                    for severity, count in (doc.severity_count or {}).items():
                         if severity in report['severity_breakdown']:
                             report['severity_breakdown'][severity] += count
 
+        base64_scan = report['base64_scan']
+        if base64_scan['seconds'] > 0:
+            base64_scan['candidates_per_second'] = round(base64_scan['candidates'] / base64_scan['seconds'], 1)
+
         # 保存报告
         with open(report_file, 'w', encoding='utf-8') as f:
             json.dump(report, f, ensure_ascii=False, indent=2)
 
-        self.logger.info(f"隐私检测报告已生成: {report_file}")
+        self.logger.info(
+            f"隐私检测报告已生成: {report_file} (Base64 候选: {base64_scan['candidates']}, "
+            f"解码: {base64_scan['decoded']}, 吞吐: {base64_scan['candidates_per_second'] or '-'} 个/秒, "
+            f"缓存命中: {report['cache']['hits']}/{report['cache']['hits'] + report['cache']['misses']})"
+        )
 
     def run(self, batch_files):
         """运行隐私检测流程"""
@@ -357,7 +630,7 @@ if __name__ == "__main__":
     checker = PrivacyChecker('config')
 
     # 查找审查后的批次文件
-    batch_files = list(Path('.').glob('batch_*_reviewed.json'))
+    batch_files = list(Path('.').glob('batch_*_reviewed.jsonl'))
     if batch_files:
         checked = checker.run([str(f) for f in batch_files])
         print(f"\n成功检测 {len(checked)} 个批次")
@@ -365,7 +638,7 @@ if __name__ == "__main__":
         # 打印摘要
         total_detections = 0
         for batch_file in checked:
-            report_file = batch_file.replace('_privacy_checked.json', '_privacy_report.json')
+            report_file = stage_batch_file(batch_file, 'privacy_report', ext='.json')
             if Path(report_file).exists():
                 with open(report_file, 'r', encoding='utf-8') as f:
                     report = json.load(f)
@@ -1,5 +1,4 @@
 """自动发布脚本"""
-import json
 import os
 import subprocess
 import shutil
@@ -11,7 +10,7 @@ from datetime import datetime
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger, load_config, save_config
+from utils import setup_logger, load_config, save_config, iter_batch, transform_batch, stage_batch_file
 
 class BlogPublisher:
     """博客发布器"""
@@ -31,12 +30,12 @@ class BlogPublisher:
 
         self.logger.info("博客发布器初始化完成")
 
-    def create_post_file(self, doc_info):
+    def create_post_file(self, doc):
         """创建博客文章文件"""
         try:
-            title = doc_info['optimized_title']
-            slug = doc_info['slug']
-            front_matter = doc_info['front_matter']
+            title = doc.optimized_title
+            slug = doc.slug
+            front_matter = doc.front_matter or ''
 
             # 生成文件名
             date_prefix = datetime.now().strftime('%Y-%m-%d')
@@ -45,18 +44,19 @@ class BlogPublisher:
 
             # 写入文件
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(front_matter)
+                f.write(front_matter + doc.content)
 
             self.logger.info(f"创建博客文章: {filename}")
             return filepath, filename
 
         except Exception as e:
-            self.logger.error(f"创建博客文章失败 {doc_info.get('filename', 'unknown')}: {e}")
+            self.logger.error(f"创建博客文章失败 {doc.filename or 'unknown'}: {e}")
             return None, None
 
     def test_local_server(self, timeout=30):
         """测试本地服务器"""
         self.logger.info("启动本地服务器进行测试...")
+        original_dir = Path.cwd()
 
         try:
             # 切换到博客根目录
@@ -95,9 +95,9 @@ class BlogPublisher:
             return False
         finally:
             # 切回原目录
-            os.chdir(Path.cwd().parent / 'auto-post')
+            os.chdir(original_dir)
 
-    def move_to_posted(self, original_file, doc_info):
+    def move_to_posted(self, original_file, doc):
         """将已发布的文档移动到 posted 目录"""
         try:
             if not original_file.exists():
@@ -123,6 +123,7 @@ class BlogPublisher:
     def deploy_blog(self):
         """部署博客"""
         self.logger.info("开始部署博客...")
+        original_dir = Path.cwd()
 
         try:
             # 切换到博客根目录
@@ -153,76 +154,73 @@ class BlogPublisher:
             return False
         finally:
             # 切回原目录
-            os.chdir(Path.cwd().parent / 'auto-post')
+            os.chdir(original_dir)
 
-    def process_document(self, doc_info):
+    def process_document(self, doc):
         """处理单个文档的发布"""
         try:
             # 1. 创建博客文章文件
-            post_file, filename = self.create_post_file(doc_info)
+            post_file, filename = self.create_post_file(doc)
             if not post_file:
                 return False
 
             # 2. 更新文档信息
-            doc_info.update({
-                'post_file': str(post_file),
-                'post_filename': filename,
-                'publish_time': datetime.now().isoformat(),
-                'status': 'published'
-            })
+            doc.post_file = str(post_file)
+            doc.post_filename = filename
+            doc.publish_time = datetime.now().isoformat()
+            doc.complete_stage('published')
 
             # 3. 移动原始文档到 posted 目录
-            original_file = Path(doc_info['path'])
-            self.move_to_posted(original_file, doc_info)
+            original_file = Path(doc.path)
+            self.move_to_posted(original_file, doc)
 
             return True
 
         except Exception as e:
-            self.logger.error(f"发布文档失败 {doc_info.get('filename', 'unknown')}: {e}")
-            doc_info['status'] = 'publish_failed'
-            doc_info['error'] = str(e)
+            self.logger.error(f"发布文档失败 {doc.filename or 'unknown'}: {e}")
+            doc.fail('publish_failed', e)
             return False
 
-    def process_batch(self, batch_file, test_local=False, deploy=False):
-        """处理一批文档"""
-        self.logger.info(f"开始发布批次: {batch_file}")
-
-        # 加载增强后的批次文件
-        try:
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
-        except Exception as e:
-            self.logger.error(f"加载批次文件失败: {e}")
-            return None
-
-        # 处理每个文档
+    def process_documents(self, documents):
+        """发布一组文档（在内存中处理，不读写批次文件）"""
         published_docs = []
-        successful_count = 0
-
         for doc in documents:
             # 检查文档状态：enhanced, reviewed, privacy_checked, 或 format_checked 都可以发布
-            if doc.get('status') in ['enhanced', 'reviewed', 'privacy_checked', 'format_checked']:
-                if self.process_document(doc):
-                    successful_count += 1
-                published_docs.append(doc)
-            else:
-                published_docs.append(doc)
+            if doc.status in ['enhanced', 'reviewed', 'privacy_checked', 'format_checked']:
+                self.process_document(doc)
+            published_docs.append(doc)
+        return published_docs
 
-        # 保存发布记录
-        published_batch_file = batch_file.replace('_enhanced.json', '_published.json')
+    def finish_publishing(self, successful_count, test_local=False, deploy=False):
+        """发布完成后测试本地服务器和部署到远程（均可选），返回是否全部成功"""
+        success = True
+
+        # 测试本地服务器（可选）
+        if test_local and successful_count > 0:
+            success = self.test_local_server() and success
+
+        # 部署到远程（可选）
+        if deploy and successful_count > 0:
+            success = self.deploy_blog() and success
+
+        return success
+
+    def process_batch(self, batch_file, test_local=False, deploy=False):
+        """处理一批文档"""
+        self.logger.info(f"开始发布批次: {batch_file}")
+
+        # 逐个文档发布并保存发布记录
+        published_batch_file = stage_batch_file(batch_file, 'published')
         try:
-            with open(published_batch_file, 'w', encoding='utf-8') as f:
-                json.dump(published_docs, f, ensure_ascii=False, indent=2)
+            transform_batch(batch_file, published_batch_file, self.process_documents)
+            successful_count = sum(
+                1 for data in iter_batch(published_batch_file, fields=('status',))
+                if data.get('status') == 'published'
+            )
 
             self.logger.info(f"批次发布完成，成功发布 {successful_count} 篇文章，记录已保存到: {published_batch_file}")
 
-            # 测试本地服务器（可选）
-            if test_local and successful_count > 0:
-                self.test_local_server()
-
-            # 部署到远程（可选）
-            if deploy and successful_count > 0:
-                self.deploy_blog()
+            self.finish_publishing(successful_count, test_local, deploy)
 
             return published_batch_file
 
@@ -247,7 +245,7 @@ if __name__ == "__main__":
     publisher = BlogPublisher('config')
 
     # 查找增强后的批次文件
-    batch_files = list(Path('.').glob('batch_*_enhanced.json'))
+    batch_files = list(Path('.').glob('batch_*_enhanced.jsonl'))
     if batch_files:
         # 询问是否要测试和部署
         test_local = input("\n是否要测试本地服务器? (y/n): ").lower() == 'y'
@@ -1,6 +1,6 @@
 """文档读取脚本"""
 import os
-import json
+import hashlib
 from pathlib import Path
 import sys
 from datetime import datetime
@@ -9,153 +9,238 @@ from datetime import datetime
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger, load_config, save_config
+from utils import setup_logger, load_config, save_batch, decode_document
+from state_store import StateStore
+from document import Document
 
 class DocumentReader:
     """文档读取器"""
 
-    def __init__(self, config_dir):
+    def __init__(self, config_dir, store=None):
         self.logger = setup_logger('DocumentReader', 'logs/reader.log')
         self.config_dir = config_dir
         self.unpost_dir = Path('../unpost')
-        self.processed_docs_file = Path('config/processed_docs.json')
+        self.processed_docs_file = Path(config_dir) / 'processed_docs.json'
 
-        # 加载已处理的文档记录
-        self.processed_docs = load_config(self.processed_docs_file) if self.processed_docs_file.exists() else {}
+        # 文档清单保存在 SQLite 状态库中
+        self.store = store or StateStore(Path(config_dir) / 'state.db')
+        if self.store.is_empty() and self.processed_docs_file.exists():
+            processed_docs = load_config(self.processed_docs_file)
+            self.store.import_processed_docs(processed_docs)
+            self.logger.info(f"已从 {self.processed_docs_file} 导入 {len(processed_docs)} 条文档记录")
+
+        # 扫描时一次性加载的清单缓存
+        self.manifest = {}
 
         self.logger.info("文档读取器初始化完成")
 
-    def scan_unpost_directory(self):
-        """扫描 unpost 目录，获取所有未处理的文档"""
+    def _is_settled(self, record):
+        """文档是否已经处理到终态（已发布或处理失败）"""
+        return bool(record.get('completed')) or (record.get('status') or '').endswith('_failed')
+
+    def scan_unpost_directory(self, exclude=(), include_failed=False):
+        """扫描 unpost 目录，获取所有新增或已修改的文档
+
+        每个文件只 stat 一次；大小和修改时间与清单记录一致且已处理到终态的
+        文件直接跳过，不打开文件。include_failed 为 True 时处理失败的文档
+        也会重新处理；exclude 中的文档（已从检查点恢复）不再扫描。
+        """
         if not self.unpost_dir.exists():
             self.logger.error(f"unpost 目录不存在: {self.unpost_dir}")
             return []
 
         documents = []
+        skipped = 0
+        self.manifest = self.store.load_manifest()
 
         # 遍历目录下的所有文件（不包括子目录）
-        for file_path in self.unpost_dir.iterdir():
-            if file_path.is_file() and not file_path.name.startswith('.'):
+        with os.scandir(self.unpost_dir) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+
                 # 检查文件扩展名
-                if file_path.suffix.lower() in ['.md', '.txt', '.markdown']:
-                    # 检查是否已经处理过
-                    file_key = str(file_path.relative_to(self.unpost_dir))
-                    if file_key not in self.processed_docs or not self.processed_docs[file_key].get('completed', False):
-                        documents.append({
-                            'path': str(file_path),  # 转换为字符串
-                            'relative_path': file_key,
-                            'filename': file_path.name,
-                            'size': file_path.stat().st_size,
-                            'modified': datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-                        })
-
-        self.logger.info(f"发现 {len(documents)} 个未处理的文档")
+                if os.path.splitext(entry.name)[1].lower() not in ['.md', '.txt', '.markdown']:
+                    continue
+
+                file_key = entry.name
+                if file_key in exclude:
+                    continue
+
+                stat = entry.stat()
+                record = self.manifest.get(file_key)
+
+                # 大小和修改时间都未变化，且已处理到终态：跳过
+                if (record and self._is_settled(record)
+                        and not (include_failed and not record.get('completed'))
+                        and record.get('size') == stat.st_size
+                        and record.get('mtime_ns') == stat.st_mtime_ns):
+                    skipped += 1
+                    continue
+
+                documents.append(Document(
+                    path=str(self.unpost_dir / entry.name),  # 转换为字符串
+                    relative_path=file_key,
+                    filename=entry.name,
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    modified=datetime.fromtimestamp(stat.st_mtime).isoformat()
+                ))
+
+        self.logger.info(f"发现 {len(documents)} 个新增或已修改的文档，跳过 {skipped} 个未变化的文档")
         return documents
 
-    def read_document(self, doc_info):
+    def read_document(self, doc):
         """读取单个文档内容"""
         try:
-            file_path_str = doc_info['path']
-            file_path = Path(file_path_str)  # 转换为 Path 对象
+            file_path = Path(doc.path)  # 转换为 Path 对象
 
-            # 尝试不同的编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16']
-            content = None
-            used_encoding = None
+            data = file_path.read_bytes()
+            content_hash = hashlib.sha256(data).hexdigest()
 
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    used_encoding = encoding
-                    self.logger.debug(f"使用 {encoding} 编码成功读取文件: {file_path.name}")
-                    break
-                except UnicodeDecodeError:
-                    continue
+            # 只是修改时间变化而内容相同：更新清单后跳过
+            record = self.manifest.get(doc.relative_path)
+            if record and self._is_settled(record) and record.get('sha256') == content_hash:
+                self.store.upsert_document(doc.relative_path, size=doc.size, mtime_ns=doc.mtime_ns)
+                self.logger.info(f"文档内容未变化，跳过: {doc.filename}")
+                return None
+
+            # 内容未变化时直接使用清单中缓存的编码，跳过检测
+            hint = record.get('encoding') if record and record.get('sha256') == content_hash else None
+            used_encoding, content = decode_document(data, hint)
 
             if content is None:
                 self.logger.error(f"无法读取文件: {file_path.name}")
                 return None
-
-            # 更新文档信息
-            doc_info.update({
-                'path': file_path_str,  # 保存字符串
-                'content': content,
-                'encoding': used_encoding,
-                'lines': len(content.split('\n')),
-                'read_time': datetime.now().isoformat(),
-                'status': 'read'
-            })
-
-            # 记录为已读取
-            self.processed_docs[doc_info['relative_path']] = {
-                'last_read': doc_info['read_time'],
-                'completed': False,
-                'steps_completed': ['read']
-            }
-
-            self.logger.info(f"成功读取文档: {doc_info['filename']}")
-            return doc_info
+            self.logger.debug(f"使用 {used_encoding} 编码成功读取文件: {file_path.name}")
+
+            # 与文本模式读取一致，统一换行符
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+
+            # 更新文档信息（行数等派生字段按需计算）
+            doc.content = content
+            doc.encoding = used_encoding
+            doc.sha256 = content_hash
+            doc.read_time = datetime.now().isoformat()
+            doc.complete_stage('read')
+
+            # 记录为已读取，同时更新清单
+            self.store.upsert_document(
+                doc.relative_path,
+                filename=doc.filename,
+                size=doc.size,
+                mtime_ns=doc.mtime_ns,
+                sha256=content_hash,
+                encoding=used_encoding,
+                status='read',
+                completed=0,
+                error=None,
+                last_read=doc.read_time
+            )
+
+            self.logger.info(f"成功读取文档: {doc.filename}")
+            return doc
 
         except Exception as e:
-            self.logger.error(f"读取文档失败 {doc_info['filename']}: {e}")
+            self.logger.error(f"读取文档失败 {doc.filename}: {e}")
             return None
 
+    def load_checkpoints(self):
+        """从状态库加载未完成文档最近一次成功阶段的输出
+
+        源文件已被修改或删除的文档不恢复，交给正常扫描重新读取。
+        已发布（文件已移动到 posted 目录）但站点生成或部署失败的文档照常恢复。
+        """
+        documents = []
+        for stage, data in self.store.latest_checkpoints():
+            doc = Document.from_dict(data)
+            if stage != 'published':
+                try:
+                    stat = Path(doc.path).stat()
+                except OSError:
+                    self.logger.warning(f"源文件不存在，无法恢复: {doc.filename or 'unknown'}")
+                    continue
+                if stat.st_size != doc.size or stat.st_mtime_ns != doc.mtime_ns:
+                    self.logger.info(f"源文件已修改，重新读取: {doc.filename or 'unknown'}")
+                    continue
+
+            documents.append(doc)
+            self.logger.info(f"从 {stage} 阶段恢复文档: {doc.filename or 'unknown'}")
+
+        return documents
+
+    def collect_documents(self, resume=False):
+        """收集本次需要处理的文档
+
+        resume 为 True 时先从检查点恢复未完成的文档，只需执行剩余阶段；
+        处理失败的文档也会重试。
+        """
+        resumed = self.load_checkpoints() if resume else []
+        scanned = self.scan_unpost_directory(
+            exclude={doc.relative_path for doc in resumed},
+            include_failed=resume
+        )
+        return resumed + scanned
+
+    def record_results(self, documents):
+        """把流程结束时各文档的状态写回清单"""
+        self.store.update_statuses([
+            (doc.relative_path, doc.status, doc.status == 'published', doc.error)
+            for doc in documents if doc.relative_path
+        ])
+
     def save_document_batch(self, documents, batch_file):
         """保存一批文档到文件"""
         try:
-            with open(batch_file, 'w', encoding='utf-8') as f:
-                json.dump(documents, f, ensure_ascii=False, indent=2)
+            save_batch(documents, batch_file)
             self.logger.info(f"文档批次已保存到: {batch_file}")
             return True
         except Exception as e:
             self.logger.error(f"保存文档批次失败: {e}")
             return False
 
-    def update_processed_docs(self):
-        """更新已处理文档记录"""
-        return save_config(self.processed_docs, self.processed_docs_file)
+    def iter_batches(self, documents, batch_size=10, save_batches=True):
+        """逐批读取文档并立即产出批次
 
-    def create_batch(self, documents, batch_size=10):
-        """创建文档批次"""
-        batches = []
+        save_batches 为 False 时只在内存中返回批次，不写批次文件。
+        """
         for i in range(0, len(documents), batch_size):
             batch = documents[i:i + batch_size]
-            batch_file = Path(f'batch_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{i // batch_size + 1}.json')
+            batch_file = Path(f'batch_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{i // batch_size + 1}.jsonl')
 
             # 读取批次中的所有文档
             processed_batch = []
             for doc in batch:
-                processed_doc = self.read_document(doc)
+                # 从检查点恢复的文档已有内容和状态，不需要重新读取
+                processed_doc = doc if doc.status else self.read_document(doc)
                 if processed_doc:
                     processed_batch.append(processed_doc)
 
             if processed_batch:
-                if self.save_document_batch(processed_batch, batch_file):
-                    batches.append({
+                if not save_batches or self.save_document_batch(processed_batch, batch_file):
+                    yield {
                         'batch_file': str(batch_file),
                         'count': len(processed_batch),
                         'documents': processed_batch
-                    })
+                    }
 
-        return batches
+    def create_batch(self, documents, batch_size=10, save_batches=True):
+        """创建文档批次"""
+        return list(self.iter_batches(documents, batch_size, save_batches))
 
-    def run(self):
+    def run(self, batch_size=10, save_batches=True, resume=False):
         """执行文档读取流程"""
         self.logger.info("开始文档读取流程")
 
-        # 扫描 unpost 目录
-        documents = self.scan_unpost_directory()
+        # 扫描 unpost 目录（resume 时先从检查点恢复）
+        documents = self.collect_documents(resume)
 
         if not documents:
             self.logger.info("没有发现新文档")
             return []
 
         # 创建批次
-        batches = self.create_batch(documents)
-
-        # 更新已处理文档记录
-        self.update_processed_docs()
+        batches = self.create_batch(documents, batch_size, save_batches)
 
         self.logger.info(f"文档读取完成，共创建 {len(batches)} 个批次")
         return batches
@@ -0,0 +1,106 @@
+"""结果缓存（SQLite）"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+"""
+
+def fingerprint(*parts):
+    """把若干可 JSON 序列化的对象算成一个指纹（键顺序无关）"""
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def content_hash(text):
+    """正文的 SHA-256"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """按键保存 JSON 结果的磁盘缓存，总大小超过上限时按最近最少使用淘汰
+
+    键由调用方根据输入内容和配置指纹生成，配置一变键就不同，旧条目不会
+    再被命中，最终被淘汰。数据库在第一次使用时才打开，多进程执行时每个
+    工作进程各自打开连接（WAL 模式，可以并发读写），不沿用 fork 前父进程
+    的连接。
+    """
+
+    def __init__(self, db_file, max_bytes=64 * 1024 * 1024):
+        self.db_file = str(db_file)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        """返回本进程的数据库连接，需要时创建"""
+        if self._conn is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+                self._conn = None
+
+    def get(self, key):
+        """读取缓存结果，没有时返回 None（命中时更新最近使用时间）"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """保存结果，并在总大小超过上限时淘汰最久未使用的条目"""
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        size = len(data.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+                    (key, data, size, time.time())
+                )
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                if total > self.max_bytes:
+                    self._evict(conn, total - self.max_bytes)
+
+    def _evict(self, conn, excess):
+        """按最近使用时间从旧到新删除条目，直到释放 excess 字节"""
+        evicted = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_used'):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM entries WHERE key = ?', evicted)
+
+    def stats(self):
+        """条目数和总大小"""
+        with self._lock:
+            count, total = self._connect().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+        return {'entries': count, 'bytes': total}
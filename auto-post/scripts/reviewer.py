@@ -1,5 +1,4 @@
 """内容审查和修正脚本"""
-import json
 import re
 from pathlib import Path
 import sys
@@ -10,11 +9,17 @@ import os
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, 'scripts'))
 
-from utils import setup_logger
+from utils import setup_logger, transform_batch, stage_batch_file
+from markdown_model import parse_markdown, rewrite_prose, LineNormalizer, FENCE_OPEN, FENCE_CLOSE
+from result_cache import fingerprint
 
 class ContentReviewer:
     """内容审查器"""
 
+    # 阶段缓存：处理的文档状态和处理逻辑版本（逻辑变化时递增，使缓存失效）
+    INPUT_STATUS = 'enhanced'
+    STAGE_VERSION = 1
+
     def __init__(self, config_dir):
         self.logger = setup_logger('ContentReviewer', 'logs/reviewer.log')
         self.config_dir = Path(config_dir)
@@ -117,20 +122,36 @@ class ContentReviewer:
             (r'\s+$', ''),     # 行尾空格
         ]
 
+        # 所有技术术语合并成一个正则，长的术语优先（如 api key 优先于 api），
+        # 匹配后按小写形式查表得到修正结果
+        terms = sorted(self.tech_corrections, key=len, reverse=True)
+        self.tech_terms_pattern = re.compile(
+            r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\b',
+            re.IGNORECASE
+        )
+
+        # 标题和列表标记后的空格逐行一次修正
+        self.line_normalizer = LineNormalizer(indented_headings=True)
+
         self.logger.info("内容审查器初始化完成")
 
     def check_technical_terms(self, content):
         """检查并修正技术术语"""
-        corrections_made = []
+        matched = set()
 
-        # 处理技术术语
-        for incorrect, correct in self.tech_corrections.items():
-            # 使用正则表达式进行匹配，确保是独立的单词
-            pattern = r'\b' + re.escape(incorrect) + r'\b'
-            matches = re.findall(pattern, content, flags=re.IGNORECASE)
-            if matches:
-                content = re.sub(pattern, correct, content, flags=re.IGNORECASE)
-                corrections_made.append(f"'{incorrect}' -> '{correct}'")
+        def replace(match):
+            incorrect = match.group().lower()
+            matched.add(incorrect)
+            return self.tech_corrections[incorrect]
+
+        # 一次扫描完成所有术语的匹配和替换
+        content = self.tech_terms_pattern.sub(replace, content)
+
+        # 按配置顺序报告命中的术语
+        corrections_made = [
+            f"'{incorrect}' -> '{correct}'"
+            for incorrect, correct in self.tech_corrections.items() if incorrect in matched
+        ]
 
         return content, corrections_made
 
@@ -147,48 +168,39 @@ class ContentReviewer:
 
         return content, corrections_made
 
-    def check_code_blocks(self, content):
-        """检查代码块语法"""
+    def check_code_blocks(self, content, model=None):
+        """检查代码块语法（model 为 content 的 Markdown 结构模型，可选）"""
         corrections_made = []
-        lines = content.split('\n')
+        model = parse_markdown(content, model)
         corrected_lines = []
-        in_code_block = False
-        code_block_lang = None
-
-        for line in lines:
-            stripped = line.strip()
 
+        for i, (line, kind) in enumerate(zip(model.lines, model.kinds)):
             # 检查代码块标记
-            if stripped.startswith('```'):
-                if not in_code_block:
-                    # 开始代码块
-                    lang = stripped[3:].strip() or 'text'
-                    # 修正常见的语言名称错误
-                    if lang.lower() in ['js', 'javascript']:
-                        lang = 'javascript'
-                    elif lang.lower() in ['py', 'python']:
-                        lang = 'python'
-                    elif lang.lower() in ['sh', 'bash', 'shell']:
-                        lang = 'bash'
-                    elif lang.lower() in ['html', 'htm']:
-                        lang = 'html'
-                    elif lang.lower() in ['css', 'stylesheet']:
-                        lang = 'css'
-                    elif lang.lower() in ['json', 'JSON']:
-                        lang = 'json'
-                    elif lang.lower() in ['xml', 'XML']:
-                        lang = 'xml'
-                    elif lang.lower() in ['sql', 'SQL']:
-                        lang = 'sql'
-
-                    corrected_lines.append(f"```{lang}")
-                    in_code_block = True
-                    code_block_lang = lang
-                else:
-                    # 结束代码块
-                    corrected_lines.append('```')
-                    in_code_block = False
-                    code_block_lang = None
+            if kind == FENCE_OPEN:
+                # 开始代码块
+                lang = model.fence_info[i] or 'text'
+                # 修正常见的语言名称错误
+                if lang.lower() in ['js', 'javascript']:
+                    lang = 'javascript'
+                elif lang.lower() in ['py', 'python']:
+                    lang = 'python'
+                elif lang.lower() in ['sh', 'bash', 'shell']:
+                    lang = 'bash'
+                elif lang.lower() in ['html', 'htm']:
+                    lang = 'html'
+                elif lang.lower() in ['css', 'stylesheet']:
+                    lang = 'css'
+                elif lang.lower() in ['json', 'JSON']:
+                    lang = 'json'
+                elif lang.lower() in ['xml', 'XML']:
+                    lang = 'xml'
+                elif lang.lower() in ['sql', 'SQL']:
+                    lang = 'sql'
+
+                corrected_lines.append(f"```{lang}")
+            elif kind == FENCE_CLOSE:
+                # 结束代码块
+                corrected_lines.append('```')
             else:
                 corrected_lines.append(line)
 
@@ -198,12 +210,8 @@ class ContentReviewer:
         """检查 Markdown 语法"""
         corrections_made = []
 
-        # 检查标题格式
-        content = re.sub(r'^(\s*#{1,6})([^#\s])', r'\1 \2', content, flags=re.MULTILINE)
-
-        # 检查列表格式
-        content = re.sub(r'^(\s*)([-*+])([^ \s])', r'\1\2 \3', content, flags=re.MULTILINE)
-        content = re.sub(r'^(\s*)(\d+)([^ \s.])', r'\1\2. \3', content, flags=re.MULTILINE)
+        # 检查标题和列表格式
+        content = self.line_normalizer.normalize(content)
 
         # 检查链接格式
         content = re.sub(r'\[\s*([^\]]+)\s*\]\s*\(\s*([^)]+)\s*\)', r'[\1](\2)', content)
@@ -238,80 +246,85 @@ class ContentReviewer:
 
         return warnings
 
-    def review_content(self, doc_info):
+    def review_prose(self, content):
+        """依次检查技术术语、语法和 Markdown 语法，返回 (内容, 修正记录)"""
+        corrections_made = []
+
+        content, tech_corrections = self.check_technical_terms(content)
+        corrections_made.extend(tech_corrections)
+
+        content, grammar_corrections = self.check_grammar(content)
+        corrections_made.extend(grammar_corrections)
+
+        content, markdown_corrections = self.check_markdown_syntax(content)
+        corrections_made.extend(markdown_corrections)
+
+        return content, corrections_made
+
+    def review_content(self, doc):
         """审查文档内容"""
         try:
-            content = doc_info['optimized_content']
+            content = doc.content
             all_corrections = []
             all_warnings = []
 
-            # 1. 检查技术术语
-            content, tech_corrections = self.check_technical_terms(content)
-            all_corrections.extend(tech_corrections)
-
-            # 2. 检查语法
-            content, grammar_corrections = self.check_grammar(content)
-            all_corrections.extend(grammar_corrections)
+            # 1-2, 4. 技术术语、语法和 Markdown 语法只修正正文，
+            # 代码块、行内代码和 URL 保持原样
+            content, prose_corrections = rewrite_prose(content, self.review_prose, doc.markdown)
+            all_corrections.extend(prose_corrections)
 
             # 3. 检查代码块
             content, code_corrections = self.check_code_blocks(content)
             all_corrections.extend(code_corrections)
 
-            # 4. 检查 Markdown 语法
-            content, markdown_corrections = self.check_markdown_syntax(content)
-            all_corrections.extend(markdown_corrections)
-
             # 5. 检查事实准确性
             factual_warnings = self.check_factual_accuracy(content)
             all_warnings.extend(factual_warnings)
 
             # 更新文档信息
-            doc_info.update({
-                'reviewed_content': content,
-                'corrections': all_corrections,
-                'warnings': all_warnings,
-                'review_time': datetime.now().isoformat(),
-                'status': 'reviewed'
-            })
+            doc.corrections = all_corrections
+            doc.warnings = all_warnings
+            doc.review_time = datetime.now().isoformat()
 
-            # 保存修正后的内容到 optimized_content
-            doc_info['optimized_content'] = content
+            # 用修正后的内容替换正文
+            doc.update_content(content, 'reviewed')
+            doc.complete_stage('reviewed')
 
-            self.logger.info(f"内容审查完成: {doc_info['filename']} (修正: {len(all_corrections)}, 警告: {len(all_warnings)})")
-            return doc_info
+            self.logger.info(f"内容审查完成: {doc.filename} (修正: {len(all_corrections)}, 警告: {len(all_warnings)})")
+            return doc
 
         except Exception as e:
-            self.logger.error(f"内容审查失败 {doc_info.get('filename', 'unknown')}: {e}")
-            doc_info['status'] = 'review_failed'
-            doc_info['error'] = str(e)
-            return doc_info
+            self.logger.error(f"内容审查失败 {doc.filename or 'unknown'}: {e}")
+            doc.fail('review_failed', e)
+            return doc
 
-    def process_batch(self, batch_file):
-        """处理一批文档"""
-        self.logger.info(f"开始审查批次: {batch_file}")
+    def cache_fingerprint(self):
+        """影响阶段输出的配置指纹"""
+        return fingerprint(self.tech_corrections, self.grammar_corrections)
 
-        # 加载批次文件
-        try:
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
-        except Exception as e:
-            self.logger.error(f"加载批次文件失败: {e}")
-            return None
+    def refresh_cached(self, doc):
+        """使用缓存的输出时重新生成时间戳"""
+        doc.review_time = datetime.now().isoformat()
 
-        # 处理每个文档
+    def process_documents(self, documents):
+        """审查一组文档（在内存中处理，不读写批次文件）"""
         reviewed_docs = []
         for doc in documents:
-            if doc.get('status') == 'enhanced':
+            if doc.status == self.INPUT_STATUS:
                 reviewed_doc = self.review_content(doc)
                 reviewed_docs.append(reviewed_doc)
             else:
                 reviewed_docs.append(doc)
+        return reviewed_docs
+
+    def process_batch(self, batch_file):
+        """处理一批文档"""
+        self.logger.info(f"开始审查批次: {batch_file}")
 
-        # 保存审查后的批次
-        reviewed_batch_file = batch_file.replace('_enhanced.json', '_reviewed.json')
+        # 逐个文档处理并写入审查后的批次
+        reviewed_batch_file = stage_batch_file(batch_file, 'reviewed')
         try:
-            with open(reviewed_batch_file, 'w', encoding='utf-8') as f:
-                json.dump(reviewed_docs, f, ensure_ascii=False, indent=2)
+            transform_batch(batch_file, reviewed_batch_file, self.process_documents)
 
             self.logger.info(f"批次审查完成，已保存到: {reviewed_batch_file}")
             return reviewed_batch_file
@@ -337,7 +350,7 @@ if __name__ == "__main__":
     reviewer = ContentReviewer('config')
 
     # 查找增强后的批次文件
-    batch_files = list(Path('.').glob('batch_*_enhanced.json'))
+    batch_files = list(Path('.').glob('batch_*_enhanced.jsonl'))
     if batch_files:
         reviewed = reviewer.run([str(f) for f in batch_files])
         print(f"\n成功审查 {len(reviewed)} 个批次")
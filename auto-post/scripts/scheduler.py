@@ -0,0 +1,159 @@
+"""流式阶段调度器"""
+import queue
+import threading
+from collections import namedtuple
+
+# 队列结束标记
+_DONE = object()
+
+# 阶段类型：修改文档的阶段按顺序执行；只读校验阶段在快照上并发执行
+MUTATING = 'mutating'
+READ_ONLY = 'read_only'
+
+# 只读校验使用的文档快照（字符串不可变，结构模型解析后不再修改）。
+# markdown 为正文已经解析的结构模型，没有时为 None，由校验函数自行解析；
+# front_matter 为增强阶段生成、发布时写在正文前的头部
+DocumentSnapshot = namedtuple(
+    'DocumentSnapshot', ['filename', 'content', 'markdown', 'has_critical_issues', 'front_matter']
+)
+
+def snapshot_documents(batches):
+    """为各批次中的文档创建只读快照，之后的阶段修改文档不影响快照"""
+    return [
+        DocumentSnapshot(
+            doc.filename or 'unknown', doc.content or '', doc.parsed_markdown, bool(doc.has_critical_issues),
+            doc.front_matter or ''
+        )
+        for batch in batches for doc in batch['documents']
+    ]
+
+class StreamingScheduler:
+    """流式阶段调度器
+
+    每个阶段一个线程，阶段之间用有界队列连接。批次读取完成后立即进入
+    第一个阶段，前一个批次还在审查时下一个批次已经开始优化，第一篇文章
+    不必等待整个积压队列走完所有阶段才能发布。只读阶段不占用流水线：
+    批次离开前一个阶段时为它创建快照并提交校验，批次直接进入下一阶段。
+    """
+
+    def __init__(self, stages, queue_size=2, logger=None, validators=None):
+        # stages: [(阶段名称, 处理函数[, 阶段类型])]，默认为 MUTATING。
+        # MUTATING 阶段的处理函数原地修改批次；READ_ONLY 阶段的处理函数
+        # 接收批次的文档快照并返回校验结果，提交到 validators 线程池后
+        # 批次立即进入下一阶段（没有线程池时在当前线程执行）。
+        self.stages = []
+        self.validators_after = {}
+        for stage in stages:
+            name, func = stage[0], stage[1]
+            kind = stage[2] if len(stage) > 2 else MUTATING
+            if kind == READ_ONLY:
+                # 挂到前一个修改阶段之后（-1 表示读取之后）
+                self.validators_after.setdefault(len(self.stages) - 1, []).append((name, func))
+            else:
+                self.stages.append((name, func))
+        self.queue_size = max(1, queue_size)
+        self.logger = logger
+        self.validators = validators
+        self.errors = []
+        self._lock = threading.Lock()
+        # 只读阶段的结果：{阶段名称: [(批次, 结果)]}
+        self.results = {}
+        self._pending = []
+
+    def _record_error(self, stage_name, batch, error):
+        """记录阶段错误"""
+        message = f"{stage_name} 阶段处理批次 {batch.get('batch_file', 'unknown')} 失败: {error}"
+        if self.logger:
+            self.logger.error(message)
+        with self._lock:
+            self.errors.append(message)
+
+    def _validate(self, position, batch):
+        """对批次快照执行挂在 position 之后的只读阶段"""
+        validators = self.validators_after.get(position)
+        if not validators:
+            return
+
+        snapshots = snapshot_documents([batch])
+        for stage_name, func in validators:
+            if self.validators is None:
+                self._collect(stage_name, batch, func, snapshots)
+            else:
+                self._pending.append(self.validators.submit(self._collect, stage_name, batch, func, snapshots))
+
+    def _collect(self, stage_name, batch, func, snapshots):
+        """执行一个只读阶段并保存结果"""
+        try:
+            result = func(snapshots)
+        except Exception as e:
+            self._record_error(stage_name, batch, e)
+            return
+        with self._lock:
+            self.results.setdefault(stage_name, []).append((batch, result))
+
+    def _feed(self, source, output):
+        """从批次来源读取批次并送入第一个队列"""
+        try:
+            for batch in source:
+                self._validate(-1, batch)
+                output.put(batch)
+        except Exception as e:
+            self._record_error('read', {}, e)
+        finally:
+            output.put(_DONE)
+
+    def _work(self, position, stage_name, func, input_queue, output_queue, final_queue):
+        """阶段线程：逐个处理批次并传给下一阶段
+
+        阶段出错时批次中的文档标记为 <阶段名称>_failed，批次不再进入后续
+        阶段，直接送到最后的队列，仍然计入结果并写回状态库。
+        """
+        while True:
+            batch = input_queue.get()
+            if batch is _DONE:
+                output_queue.put(_DONE)
+                return
+
+            try:
+                func(batch)
+            except Exception as e:
+                self._record_error(stage_name, batch, e)
+                for doc in batch.get('documents', []):
+                    doc.fail(f'{stage_name}_failed', e)
+                final_queue.put(batch)
+                continue
+
+            self._validate(position, batch)
+            output_queue.put(batch)
+
+    def run(self, source):
+        """运行调度器，返回按完成顺序排列的批次列表（只读阶段的结果在 self.results 中）"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), name='stage-read', daemon=True)]
+        for i, (stage_name, func) in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._work,
+                args=(i, stage_name, func, queues[i], queues[i + 1], queues[-1]),
+                name=f'stage-{stage_name}',
+                daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+
+        finished = []
+        while True:
+            batch = queues[-1].get()
+            if batch is _DONE:
+                break
+            finished.append(batch)
+
+        for thread in threads:
+            thread.join()
+
+        # 等待所有只读阶段完成
+        for future in self._pending:
+            future.result()
+
+        return finished
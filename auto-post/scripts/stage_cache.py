@@ -0,0 +1,105 @@
+"""阶段输出缓存"""
+import copy
+import hashlib
+import json
+import re
+import threading
+
+from document import Document
+from result_cache import ResultCache
+
+# 每次运行都会变化、不影响阶段输出的字段，不参与缓存键
+VOLATILE_FIELDS = ('path', 'modified', 'mtime_ns')
+
+# 增强阶段写入 Front Matter 的日期，同样不参与缓存键
+_FRONT_MATTER_TIMESTAMP = re.compile(r'^(?:date|updated): .*$', re.MULTILINE)
+
+def _stable_fields(data):
+    """去掉每次运行都会变化的字段后的文档字典"""
+    stable = {
+        name: value for name, value in data.items()
+        if name not in VOLATILE_FIELDS and not name.endswith('_time')
+    }
+    if stable.get('front_matter'):
+        stable['front_matter'] = _FRONT_MATTER_TIMESTAMP.sub('', stable['front_matter'])
+    return stable
+
+class StageCache:
+    """按 hash(输入文档, 阶段版本, 阶段配置) 保存各阶段输出的缓存
+
+    阶段声明 INPUT_STATUS（处理哪个状态的文档）、STAGE_VERSION（处理逻辑
+    变化时递增）和 cache_fingerprint()（影响输出的配置）后即可缓存；
+    没有声明的阶段（隐私检测有自己的缓存、发布有副作用）照常执行。缓存值
+    只保存阶段修改过的字段，命中时直接写回文档，再由阶段的
+    refresh_cached() 重新生成时间戳。只缓存处理成功的文档。
+    """
+
+    def __init__(self, db_file, max_bytes):
+        self.cache = ResultCache(db_file, max_bytes)
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'stages': {}}
+
+    @staticmethod
+    def is_cacheable(stage):
+        """阶段是否声明了缓存所需的信息"""
+        return getattr(stage, 'STAGE_VERSION', None) is not None
+
+    def _stage_fingerprint(self, stage):
+        """阶段类名、版本和配置指纹（每个阶段只计算一次）"""
+        name = type(stage).__name__
+        if name not in self._fingerprints:
+            self._fingerprints[name] = f'{name}:{stage.STAGE_VERSION}:{stage.cache_fingerprint()}'
+        return self._fingerprints[name]
+
+    def key(self, stage, data):
+        """缓存键：输入文档（去掉易变字段）和阶段指纹的哈希"""
+        payload = json.dumps(
+            [self._stage_fingerprint(stage), _stable_fields(data)],
+            ensure_ascii=False, sort_keys=True, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, stage_name, outcome, size=0):
+        """累计命中/未命中次数和跳过处理的正文字节数（流式模式下多个阶段线程同时调用）"""
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats['bytes_saved'] += size
+            counts = self.stats['stages'].setdefault(stage_name, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+
+    def apply(self, stage, stage_name, doc):
+        """命中时把缓存的输出写回文档并返回 (True, None)
+
+        未命中时返回 (False, pending)，pending 为缓存键和输入文档的副本，
+        阶段处理完成后传给 store()。
+        """
+        data = copy.deepcopy(doc.to_dict())
+        key = self.key(stage, data)
+        cached = self.cache.get(key)
+        if cached is None:
+            self._count(stage_name, 'misses')
+            return False, (key, data)
+
+        size = len((doc.content or '').encode('utf-8'))
+        for name, value in cached['fields'].items():
+            setattr(doc, name, value)
+        stage.refresh_cached(doc)
+        self._count(stage_name, 'hits', size)
+        return True, None
+
+    def store(self, stage_name, pending, doc):
+        """保存阶段输出中相对输入变化的字段（pending 为 apply 的返回值）"""
+        if doc.status != stage_name:
+            return
+        key, before = pending
+        after = doc.to_dict()
+        fields = {
+            name: after.get(name) for name in Document.FIELDS
+            if after.get(name) != before.get(name)
+        }
+        self.cache.put(key, {'fields': fields})
+
+    def close(self):
+        """关闭缓存数据库"""
+        self.cache.close()
@@ -0,0 +1,205 @@
+"""流程状态存储（SQLite）"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    relative_path TEXT PRIMARY KEY,
+    filename TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT,
+    encoding TEXT,
+    status TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    last_read TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status);
+
+CREATE TABLE IF NOT EXISTS stage_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    relative_path TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT,
+    batch_file TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    duration_seconds REAL,
+    output TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stage_runs_document ON stage_runs (relative_path, stage);
+CREATE INDEX IF NOT EXISTS idx_stage_runs_status ON stage_runs (status);
+"""
+
+# documents 表中可以直接更新的列
+DOCUMENT_COLUMNS = ['filename', 'size', 'mtime_ns', 'sha256', 'encoding', 'status', 'completed', 'error', 'last_read']
+
+class StateStore:
+    """流程状态存储
+
+    用一个 WAL 模式的 SQLite 数据库保存文档清单、各阶段状态、耗时和阶段
+    输出，按行更新，不再每次重写整个 processed_docs.json。流式模式下多个
+    阶段线程共享同一个连接，所有操作都在锁内执行。
+    """
+
+    def __init__(self, db_file):
+        self.db_file = str(db_file)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._prune_outputs()
+
+    def _prune_outputs(self):
+        """清除旧版本留下的历史输出，每个文档每个阶段只保留最近一次和最近一次成功的输出"""
+        with self._conn:
+            self._conn.execute(
+                'UPDATE stage_runs SET output = NULL WHERE output IS NOT NULL AND id NOT IN ('
+                '    SELECT MAX(id) FROM stage_runs GROUP BY relative_path, stage'
+                '    UNION SELECT MAX(id) FROM stage_runs WHERE status = stage GROUP BY relative_path, stage'
+                ')'
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self):
+        """数据库中是否还没有任何文档记录"""
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM documents LIMIT 1').fetchone() is None
+
+    def load_manifest(self):
+        """一次性读取全部文档记录，返回 {relative_path: record}"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM documents').fetchall()
+        return {row['relative_path']: dict(row) for row in rows}
+
+    def get_document(self, relative_path):
+        """读取单个文档记录"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM documents WHERE relative_path = ?', (relative_path,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def upsert_document(self, relative_path, **fields):
+        """插入或更新文档记录（只更新传入的列）"""
+        fields = {k: v for k, v in fields.items() if k in DOCUMENT_COLUMNS}
+        fields['updated_at'] = datetime.now().isoformat()
+        columns = ['relative_path'] + list(fields)
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'INSERT INTO documents ({", ".join(columns)}) VALUES ({placeholders}) '
+                f'ON CONFLICT(relative_path) DO UPDATE SET {updates}',
+                [relative_path] + list(fields.values())
+            )
+
+    def update_statuses(self, records):
+        """批量更新文档状态，records 为 (relative_path, status, completed, error) 列表"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'UPDATE documents SET status = ?, completed = ?, error = ?, updated_at = ? WHERE relative_path = ?',
+                [(status, int(bool(completed)), error, now, path) for path, status, completed, error in records]
+            )
+
+    def record_stage(self, stage, documents, batch_file=None, started_at=None, durations=None):
+        """记录一个批次在某阶段的输出（每个文档一行）并同步文档状态
+
+        documents 为 Document 列表，输出保存为 Document.to_dict() 的 JSON；
+        durations 为与之对应的每个文档的处理耗时（秒）。每个文档每个阶段
+        只保留最近一次运行和最近一次成功运行（检查点）的输出，更早的记录
+        只保留状态和耗时。
+        """
+        finished_at = datetime.now().isoformat()
+        if durations is None:
+            durations = [None] * len(documents)
+        runs = []
+        statuses = []
+        for doc, duration in zip(documents, durations):
+            relative_path = doc.relative_path
+            if not relative_path:
+                continue
+            runs.append((
+                relative_path, stage, doc.status, batch_file,
+                started_at, finished_at, duration,
+                json.dumps(doc.to_dict(), ensure_ascii=False)
+            ))
+            statuses.append((doc.status, doc.error, finished_at, relative_path))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO stage_runs (relative_path, stage, status, batch_file, started_at, finished_at, '
+                'duration_seconds, output) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                runs
+            )
+            self._conn.executemany(
+                'UPDATE stage_runs SET output = NULL '
+                'WHERE relative_path = ?1 AND stage = ?2 AND output IS NOT NULL '
+                'AND id < (SELECT MAX(id) FROM stage_runs WHERE relative_path = ?1 AND stage = ?2) '
+                'AND id IS NOT (SELECT MAX(id) FROM stage_runs WHERE relative_path = ?1 AND stage = ?2 AND status = stage)',
+                [(run[0], stage) for run in runs]
+            )
+            self._conn.executemany(
+                'UPDATE documents SET status = ?, error = ?, updated_at = ? WHERE relative_path = ?',
+                statuses
+            )
+
+    def documents_by_status(self, status):
+        """查询处于指定状态的文档，例如停在 privacy_checked 的文档"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM documents WHERE status = ? ORDER BY relative_path', (status,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stage_history(self, relative_path):
+        """查询文档的阶段记录（不含输出内容）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT stage, status, batch_file, started_at, finished_at, duration_seconds '
+                'FROM stage_runs WHERE relative_path = ? ORDER BY id', (relative_path,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_checkpoints(self):
+        """返回未完成文档最近一次成功阶段的输出 [(阶段, 文档字典)]
+
+        阶段输出状态与阶段名相同（例如 reviewed 阶段输出 status 为 reviewed）
+        即视为成功的检查点。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT r.stage, r.output FROM documents d '
+                'JOIN stage_runs r ON r.id = ('
+                '    SELECT MAX(s.id) FROM stage_runs s '
+                '    WHERE s.relative_path = d.relative_path AND s.status = s.stage'
+                ') '
+                'WHERE d.completed = 0 ORDER BY d.relative_path'
+            ).fetchall()
+        return [(row['stage'], json.loads(row['output'])) for row in rows]
+
+    def import_processed_docs(self, processed_docs):
+        """从旧的 processed_docs.json 导入文档清单"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO documents (relative_path, filename, size, mtime_ns, sha256, encoding, '
+                'status, completed, last_read, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(
+                    relative_path, os.path.basename(relative_path), record.get('size'), record.get('mtime_ns'),
+                    record.get('sha256'), record.get('encoding'), record.get('status'),
+                    int(bool(record.get('completed', False))), record.get('last_read'),
+                    datetime.now().isoformat()
+                ) for relative_path, record in processed_docs.items()]
+            )
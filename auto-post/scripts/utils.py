@@ -2,18 +2,25 @@
 import os
 import re
 import json
+import codecs
 import logging
 from datetime import datetime
 from pathlib import Path
 
+from document import Document
+
 def setup_logger(name, log_file, level=logging.INFO):
     """设置日志记录器"""
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        # 同一进程中重复创建（例如并行工作进程）时不重复添加处理器
+        return logger
+
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
     handler = logging.FileHandler(log_file, encoding='utf-8')
     handler.setFormatter(formatter)
 
-    logger = logging.getLogger(name)
     logger.setLevel(level)
     logger.addHandler(handler)
 
@@ -43,6 +50,144 @@ def save_config(config, config_file):
         logging.error(f"保存配置文件失败: {e}")
         return False
 
+# 批次文件的阶段后缀（按流程顺序）
+BATCH_STAGE_SUFFIXES = ['optimized', 'enhanced', 'reviewed', 'privacy_checked', 'format_checked', 'published']
+
+def _dump_document(doc):
+    """把文档序列化为批次文件中的一行（紧凑格式）"""
+    return json.dumps(doc.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def iter_batch(batch_file, fields=None):
+    """逐个读取批次文件中的文档（字典），不把整个批次载入内存
+
+    批次文件为 JSON Lines，每行一个文档；也兼容旧的 JSON 数组格式。
+    fields 指定时只保留这些字段，扫描类操作不必持有正文等大字段。
+    """
+    with open(batch_file, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == '[':
+            records = json.load(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+
+        for data in records:
+            if fields is not None:
+                data = {key: data[key] for key in fields if key in data}
+            yield data
+
+def load_batch(batch_file, fields=None):
+    """加载整个批次文件（返回字典列表）"""
+    return list(iter_batch(batch_file, fields))
+
+def save_batch(documents, batch_file):
+    """保存批次文件（documents 为 Document 列表），返回写入的文档数"""
+    count = 0
+    with open(batch_file, 'w', encoding='utf-8') as f:
+        for doc in documents:
+            f.write(_dump_document(doc))
+            count += 1
+    return count
+
+def transform_batch(batch_file, output_file, process):
+    """逐个文档处理批次文件，返回写入的文档数
+
+    每次只读取一行、交给 process（接收并返回 Document 列表，例如各阶段的
+    process_documents）处理后立即写出，峰值内存与批次大小无关。
+    """
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as out:
+        for data in iter_batch(batch_file):
+            for doc in process([Document.from_dict(data)]):
+                out.write(_dump_document(doc))
+                count += 1
+    return count
+
+def stage_batch_file(batch_file, stage, ext='.jsonl'):
+    """根据批次文件名生成指定阶段的文件名（报告等非批次文件可指定 ext='.json'）"""
+    base = str(batch_file)
+    for batch_ext in ('.jsonl', '.json'):
+        if base.endswith(batch_ext):
+            base = base[:-len(batch_ext)]
+            break
+
+    # 去掉已有的阶段后缀，避免 batch_1_optimized_enhanced.json 这样的叠加
+    for suffix in BATCH_STAGE_SUFFIXES:
+        if base.endswith('_' + suffix):
+            base = base[:-len(suffix) - 1]
+            break
+
+    return f"{base}_{stage}{ext}"
+
+# 用于统计 UTF-8 多字节序列的模式
+_UTF8_SEQUENCE = re.compile(rb'[\xc2-\xdf][\x80-\xbf]|[\xe0-\xef][\x80-\xbf]{2}|[\xf0-\xf4][\x80-\xbf]{3}')
+
+def guess_encoding(data, sample_size=65536):
+    """根据字节统计特征猜测编码（utf-8 / gbk / utf-16）"""
+    sample = data[:sample_size]
+    if not sample:
+        return 'utf-8'
+
+    if len(data) > sample_size:
+        # 截取处可能切开一个多字节字符，去掉结尾不完整的 UTF-8 序列
+        for i in range(1, min(3, len(sample)) + 1):
+            byte = sample[-i]
+            if byte < 0x80:
+                break
+            if byte >= 0xc0:
+                if i < (2 if byte < 0xe0 else 3 if byte < 0xf0 else 4):
+                    sample = sample[:-i]
+                break
+
+    # 大量 NUL 字节：没有 BOM 的 UTF-16
+    zeros = sample.count(b'\x00')
+    if zeros > len(sample) // 10:
+        odd_zeros = sample[1::2].count(b'\x00')
+        return 'utf-16-le' if odd_zeros * 2 >= zeros else 'utf-16-be'
+
+    high_bytes = sum(1 for b in sample if b >= 0x80)
+    if high_bytes == 0:
+        return 'utf-8'
+
+    # 高位字节几乎都能组成合法的 UTF-8 序列时判为 UTF-8，否则按 GBK 处理
+    utf8_bytes = sum(len(m) for m in _UTF8_SEQUENCE.findall(sample))
+    return 'utf-8' if utf8_bytes >= high_bytes * 0.99 else 'gbk'
+
+def decode_document(data, hint=None):
+    """只对内存中的字节做一次检测并解码，返回 (编码, 文本)
+
+    hint 是之前检测出的编码（例如清单中缓存的编码），给出时直接使用，不再
+    检测。没有 hint 时先按 UTF-8 严格解码整个文件，失败再按统计特征猜测；
+    没有 BOM 的 UTF-16 中的 ASCII 字符也是合法的 UTF-8，由统计特征优先判断。
+    所有候选编码都失败时返回 (None, None)。
+    """
+    # BOM 优先
+    if data.startswith(codecs.BOM_UTF8):
+        candidates = ['utf-8-sig']
+    elif data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        candidates = ['utf-16']
+    elif hint:
+        candidates = [hint]
+    else:
+        guess = guess_encoding(data)
+        candidates = [guess] if guess.startswith('utf-16') else ['utf-8', guess]
+
+    # 猜测失败时按原来的顺序兜底
+    for encoding in ['utf-8', 'gbk', 'utf-16']:
+        if encoding not in candidates:
+            candidates.append(encoding)
+
+    for encoding in candidates:
+        try:
+            return encoding, data.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            continue
+
+    return None, None
+
 def sanitize_filename(filename):
     """清理文件名，移除特殊字符"""
     # 移除或替换特殊字符
@@ -0,0 +1,66 @@
+"""文档模型测试"""
+import os
+import random
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from document import Document, line_edits
+
+def replay(old_lines, ops):
+    """把修改记录应用到上一版本（行号都相对上一版本，从后往前替换）"""
+    lines = list(old_lines)
+    for start, end, new_lines in reversed(ops):
+        lines[start:end] = new_lines
+    return lines
+
+class LineEditsTest(unittest.TestCase):
+
+    def test_replay_reproduces_new_lines(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            old = [rng.choice('abc') for _ in range(rng.randint(0, 30))]
+            new = list(old)
+            for _ in range(rng.randint(1, 4)):
+                i = rng.randint(0, len(new))
+                choice = rng.random()
+                if choice < 0.3 and i < len(new):
+                    del new[i]
+                elif choice < 0.6:
+                    new.insert(i, rng.choice('abd'))
+                elif i < len(new):
+                    new[i] += '!'
+            self.assertEqual(replay(old, line_edits(old, new)), new)
+
+    def test_in_place_edits_keep_unchanged_lines(self):
+        old = ['# t', '', 'a', 'b', 'c', 'd']
+        new = ['# t', '', 'A', 'b', 'C', 'd']
+        self.assertEqual(line_edits(old, new), [[2, 3, ['A']], [4, 5, ['C']]])
+
+    def test_long_repetitive_document(self):
+        old = ['- item', '', '```', 'code', '```'] * 4000
+        new = [line + ' ' if i % 7 == 0 else line for i, line in enumerate(old) if i % 50 != 3]
+        started = time.perf_counter()
+        ops = line_edits(old, new)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertEqual(replay(old, ops), new)
+
+    def test_edits_at_both_ends_of_long_document(self):
+        old = ['- item', '', '```', 'code', '```'] * 4000
+        new = ['# title'] + old[1:] + ['end']
+        self.assertEqual(line_edits(old, new), [[0, 1, ['# title']], [20000, 20000, ['end']]])
+
+class DocumentTest(unittest.TestCase):
+
+    def test_update_content_records_edit(self):
+        doc = Document(content='a\nb\nc')
+        doc.update_content('a\nB\nc', 'reviewed')
+        self.assertEqual(doc.edits, [{'stage': 'reviewed', 'ops': [[1, 2, ['B']]]}])
+        doc.update_content('a\nB\nc', 'formatted')
+        self.assertEqual(len(doc.edits), 1)
+
+if __name__ == '__main__':
+    unittest.main()
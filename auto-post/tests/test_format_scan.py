@@ -0,0 +1,67 @@
+"""发布前格式检查测试"""
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from blog_enhancer import BlogEnhancer
+from document import Document
+from format_linter import FormatLinter
+from scheduler import snapshot_documents
+
+def load_main():
+    """加载主控制脚本（文件名含连字符，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location('auto_post', os.path.join(ROOT, 'auto-post.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class FormatScanTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # 日志写在当前目录的 logs/ 下，放到临时目录中
+        cls.cwd = os.getcwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.chdir(cls.tmp.name)
+        os.mkdir('logs')
+        cls.enhancer = BlogEnhancer(os.path.join(ROOT, 'config'))
+        cls.system = SimpleNamespace(format_linter=FormatLinter())
+        cls.main = load_main()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def scan(self, doc):
+        return self.main.AutoPostSystem._scan_format(self.system, snapshot_documents([{'documents': [doc]}]))
+
+    def enhanced(self, title):
+        doc = Document(
+            filename='a.md', content='# 标题\n\n正文内容。\n', status='optimized',
+            optimized_title=title, tags=['Python']
+        )
+        self.enhancer.process_documents([doc])
+        self.assertEqual(doc.status, 'enhanced')
+        return doc
+
+    def test_broken_header_is_reported(self):
+        doc = self.enhanced('部署笔记 ------ 第一部分')
+        results = self.scan(doc)
+        self.assertEqual(len(results), 1)
+        filename, diagnostics = results[0]
+        self.assertEqual(filename, 'a.md')
+        self.assertEqual([(d.rule, d.line) for d in diagnostics], [('front_matter', 2)])
+
+    def test_clean_header_passes(self):
+        doc = self.enhanced('部署笔记')
+        self.assertEqual(self.scan(doc), [])
+
+if __name__ == '__main__':
+    unittest.main()
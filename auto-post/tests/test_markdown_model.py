@@ -0,0 +1,37 @@
+"""Markdown 结构模型测试"""
+import os
+import re
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from markdown_model import rewrite_prose
+
+def italic(text):
+    """与审查器相同的斜体修正：\\s* 可以跨行"""
+    return re.sub(r'\*\s*([^*]+)\s*\*', r'*\1*', text), None
+
+class RewriteProseTest(unittest.TestCase):
+
+    def test_identity(self):
+        text = '---\ntitle: t\n---\n# 标题\n\n正文 `code` https://x.io\n```\ncode\n```\n结尾\n'
+        self.assertEqual(rewrite_prose(text, lambda view: (view, None))[0], text)
+
+    def test_fenced_block_inside_list(self):
+        text = '1. **Step one**\n   ```bash\n   ls\n   ```\n2. **Step two**\n   ```bash\n   pwd\n   ```\n'
+        self.assertEqual(rewrite_prose(text, italic)[0], text)
+
+    def test_transform_that_removes_newlines(self):
+        text = '正文\n```\ncode\n```\n下一段'
+        joined, _ = rewrite_prose(text, lambda view: (view.replace('\n', ''), None))
+        self.assertEqual(joined, '正文\n```\ncode\n```\n下一段')
+
+    def test_prose_after_block_starts_a_line(self):
+        text = '```\ncode\n```\n##标题'
+        fixed, _ = rewrite_prose(text, lambda view: (re.sub(r'^(#+)(?=[^\s#])', r'\1 ', view, flags=re.M), None))
+        self.assertEqual(fixed, '```\ncode\n```\n## 标题')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""多模式正则匹配测试"""
+import os
+import re
+import sys
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+import pattern_set
+from pattern_set import PatternSet, ScanTimeout, harden_pattern
+
+def scan(patterns, text, flags=re.IGNORECASE, **kwargs):
+    scanner = PatternSet(flags)
+    for key, pattern in patterns:
+        scanner.add(key, pattern)
+    return sorted((key, match.span()) for key, match in scanner.finditer(text, **kwargs))
+
+def expected(patterns, text, flags=re.IGNORECASE):
+    return sorted(
+        (key, match.span())
+        for key, pattern in patterns
+        for match in re.finditer(pattern, text, flags)
+        if match.end() > match.start()
+    )
+
+class HardenPatternTest(unittest.TestCase):
+
+    def test_bounds_repeat_followed_by_content(self):
+        hardened, issues = harden_pattern(r'[a-z]+@', max_repeat=64)
+        self.assertEqual(hardened, r'[a-z]{1,64}@')
+        self.assertEqual([kind for kind, _ in issues], ['unbounded_repeat'])
+
+    def test_bounds_trailing_repeat(self):
+        hardened, _ = harden_pattern(r'ya29\.[a-z]+', max_repeat=64)
+        self.assertEqual(hardened, r'ya29\.[a-z]{1,64}')
+
+    def test_reports_nested_quantifier(self):
+        _, issues = harden_pattern(r'(a+)+b')
+        self.assertIn('nested_quantifier', [kind for kind, _ in issues])
+
+class PatternSetTest(unittest.TestCase):
+
+    PATTERNS = [
+        ('domains', r'([a-z0-9-]{1,63}\.){1,8}[a-z]{2,63}'),
+        ('emails', r'[a-z0-9._%+-]{1,64}@[a-z0-9.-]{1,253}\.[a-z]{2,63}'),
+        ('ip', r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b'),
+        ('api_keys', r'sk-[a-z0-9]{8}'),
+        ('passwords', r'password[:\s=]+[^\s]{6,64}'),
+        ('pass', r'pass[:\s=]+[^\s]{6,64}'),
+    ]
+
+    def test_each_pattern_finds_its_own_matches(self):
+        text = 'spring.datasource.password=hunter2hunter2 see config.sk-ab12cd34 bob@corp.io 10.0.0.1'
+        self.assertEqual(scan(self.PATTERNS, text), expected(self.PATTERNS, text))
+        self.assertIn(('passwords', (18, 41)), scan(self.PATTERNS, text))
+
+    def test_windows_give_same_matches(self):
+        text = 'a.b x@y.io sk-12345678 1.2.3.4 password: secret12 ' * 20
+        with mock.patch.object(pattern_set._Scanner, 'WINDOW', 5):
+            self.assertEqual(scan(self.PATTERNS, text), expected(self.PATTERNS, text))
+
+    def test_lookahead_at_window_boundary(self):
+        patterns = [('x', r'[0-9]{3}(?=-x)')]
+        text = '123-x 456-y 789-x' * 3
+        with mock.patch.object(pattern_set._Scanner, 'WINDOW', 2):
+            self.assertEqual(scan(patterns, text), expected(patterns, text))
+
+    def test_deadline_inside_long_scan(self):
+        # 没有匹配的长文本：每个起点都要扫描上千个字符再回溯
+        hardened, _ = harden_pattern(r'[a-z-]+@[a-z]+\.[a-z]+', re.IGNORECASE)
+        text = '@ ' + 'a-' * 100000
+        started = time.perf_counter()
+        with self.assertRaises(ScanTimeout):
+            scan([('emails', hardened)], text, deadline=started + 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
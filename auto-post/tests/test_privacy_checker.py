@@ -0,0 +1,60 @@
+"""隐私内容检测测试"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from privacy_checker import PrivacyChecker
+
+class PrivacyCheckerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # 日志写在当前目录的 logs/ 下，放到临时目录中
+        cls.cwd = os.getcwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.chdir(cls.tmp.name)
+        os.mkdir('logs')
+        cls.checker = PrivacyChecker(os.path.join(ROOT, 'config'))
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def scan(self, content):
+        masked, detections, metrics = self.checker.scan_content(content)
+        return masked, {(d['type'], d['severity'], d['value']) for d in detections}, metrics
+
+    def test_password_inside_domain_like_text(self):
+        masked, detections, _ = self.scan('spring.datasource.password=hunter2hunter2')
+        self.assertIn(('passwords', 'critical', 'password=hunter2hunter2'), detections)
+        self.assertNotIn('hunter2', masked)
+
+    def test_api_key_after_domain_like_text(self):
+        key = 'sk-' + 'a1B2' * 12
+        masked, detections, _ = self.scan(f'see config.{key}')
+        self.assertIn(('api_keys', 'critical', key), detections)
+        self.assertNotIn(key, masked)
+
+    def test_overlapping_matches_keep_higher_severity(self):
+        masked, detections, _ = self.scan('mail bob@corp.io')
+        self.assertEqual(detections, {('emails', 'medium', 'bob@corp.io')})
+        self.assertEqual(masked, 'mail [EMAIL_REMOVED]')
+
+    def test_scan_past_budget_times_out(self):
+        limits = self.checker.scan_limits
+        budget = limits['scan_time_budget_seconds']
+        limits['scan_time_budget_seconds'] = 0.001
+        try:
+            _, detections, metrics = self.scan('@ ' + 'a-' * 100000)
+        finally:
+            limits['scan_time_budget_seconds'] = budget
+        self.assertTrue(metrics['timed_out'])
+        self.assertIn('scan_timeout', {kind for kind, _, _ in detections})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""流式阶段调度器测试"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from document import Document
+from scheduler import StreamingScheduler
+
+def batch(name):
+    return {'batch_file': name, 'documents': [Document(filename=f'{name}.md', status='read')]}
+
+class StreamingSchedulerTest(unittest.TestCase):
+
+    def test_failed_batch_is_kept_in_results(self):
+        visited = []
+
+        def optimize(batch):
+            if batch['batch_file'] == 'b':
+                raise RuntimeError('boom')
+            batch['documents'][0].status = 'optimized'
+
+        def publish(batch):
+            visited.append(batch['batch_file'])
+            batch['documents'][0].status = 'published'
+
+        scheduler = StreamingScheduler([('optimize', optimize), ('publish', publish)])
+        finished = scheduler.run(iter([batch('a'), batch('b'), batch('c')]))
+
+        docs = {b['batch_file']: b['documents'][0] for b in finished}
+        self.assertEqual({name: doc.status for name, doc in docs.items()},
+                         {'a': 'published', 'b': 'optimize_failed', 'c': 'published'})
+        self.assertEqual(docs['b'].error, 'boom')
+        self.assertEqual(sorted(visited), ['a', 'c'])
+        self.assertEqual(len(scheduler.errors), 1)
+
+if __name__ == '__main__':
+    unittest.main()
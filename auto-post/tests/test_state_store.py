@@ -0,0 +1,64 @@
+"""流程状态存储测试"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from document import Document
+from state_store import StateStore
+
+class StateStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = StateStore(os.path.join(self.tmp.name, 'state.db'))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def outputs(self):
+        rows = self.store._conn.execute(
+            'SELECT relative_path, status, output IS NOT NULL FROM stage_runs ORDER BY id'
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def test_records_duration_per_document(self):
+        docs = [Document(relative_path='a.md', status='reviewed'), Document(relative_path='b.md', status='reviewed')]
+        self.store.record_stage('reviewed', docs, durations=[0.5, 1.5])
+        self.assertEqual([run['duration_seconds'] for run in self.store.stage_history('a.md')], [0.5])
+        self.assertEqual([run['duration_seconds'] for run in self.store.stage_history('b.md')], [1.5])
+
+    def test_keeps_latest_and_latest_successful_output(self):
+        doc = Document(relative_path='a.md', content='v1', status='reviewed')
+        self.store.record_stage('reviewed', [doc])
+        doc.content = 'v2'
+        self.store.record_stage('reviewed', [doc])
+        doc.status = 'review_failed'
+        self.store.record_stage('reviewed', [doc])
+        self.assertEqual(self.outputs(), [
+            ('a.md', 'reviewed', 0),
+            ('a.md', 'reviewed', 1),
+            ('a.md', 'review_failed', 1),
+        ])
+
+        self.store.upsert_document('a.md')
+        checkpoints = self.store.latest_checkpoints()
+        self.assertEqual([(stage, data['content']) for stage, data in checkpoints], [('reviewed', 'v2')])
+
+    def test_prunes_outputs_without_successful_run(self):
+        doc = Document(relative_path='a.md', status='review_failed')
+        for _ in range(3):
+            self.store.record_stage('reviewed', [doc])
+        self.assertEqual([output for _, _, output in self.outputs()], [0, 0, 1])
+
+    def test_imported_documents_keep_basename(self):
+        self.store.import_processed_docs({os.path.join('notes', 'a.md'): {'status': 'published', 'completed': True}})
+        row = self.store._conn.execute('SELECT filename, status FROM documents').fetchone()
+        self.assertEqual(tuple(row), ('a.md', 'published'))
+
+if __name__ == '__main__':
+    unittest.main()
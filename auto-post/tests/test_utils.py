@@ -0,0 +1,45 @@
+"""工具函数测试"""
+import codecs
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+import utils
+from utils import decode_document, guess_encoding
+
+class DecodeDocumentTest(unittest.TestCase):
+
+    def test_multibyte_character_at_sample_boundary(self):
+        text = 'a' * 65534 + '的的\n'
+        data = text.encode('utf-8')
+        self.assertEqual(guess_encoding(data), 'utf-8')
+        self.assertEqual(decode_document(data), ('utf-8', text))
+
+    def test_gbk(self):
+        text = '中文文档\n' * 10
+        self.assertEqual(decode_document(text.encode('gbk')), ('gbk', text))
+
+    def test_utf16_without_bom(self):
+        text = 'plain ascii text\n'
+        self.assertEqual(decode_document(text.encode('utf-16-le')), ('utf-16-le', text))
+
+    def test_bom(self):
+        data = codecs.BOM_UTF8 + '标题'.encode('utf-8')
+        self.assertEqual(decode_document(data), ('utf-8-sig', '标题'))
+
+    def test_hint_skips_detection(self):
+        data = '中文'.encode('gbk')
+        with mock.patch.object(utils, 'guess_encoding') as guess:
+            self.assertEqual(decode_document(data, 'gbk'), ('gbk', '中文'))
+        guess.assert_not_called()
+
+    def test_wrong_hint_falls_back(self):
+        data = '中文'.encode('utf-8')
+        self.assertEqual(decode_document(data, 'ascii'), ('utf-8', '中文'))
+
+if __name__ == '__main__':
+    unittest.main()